@@ -0,0 +1,47 @@
+# benchmarks/board_generation.py
+# Usage: python -m benchmarks.board_generation [grid_size ...]
+import random
+import sys
+import time
+from services.game_service import GameService
+
+DEFAULT_GRID_SIZES = [5, 10, 20, 30, 50]
+BOARD_COUNT = 1000
+
+
+def bench_grid(grid_size: int, count: int, compact: bool) -> dict:
+    board_size = grid_size ** 2
+
+    start = time.perf_counter()
+    for _ in range(count):
+        GameService.create_ship_configuration(board_size, compact)
+    per_board = time.perf_counter() - start
+
+    start = time.perf_counter()
+    GameService.create_ship_configurations(board_size, count, compact)
+    batch = time.perf_counter() - start
+
+    return {
+        "grid_size": grid_size,
+        "boards": count,
+        "per_board_boards_per_sec": count / per_board,
+        "batch_boards_per_sec": count / batch,
+        "speedup": per_board / batch,
+    }
+
+
+def main(grid_sizes):
+    random.seed(0)
+    for compact in (False, True):
+        print(f"{'compact' if compact else 'legacy cells'}, {BOARD_COUNT} boards")
+        print(f"{'grid':>5} {'per-board/s':>12} {'batch/s':>12} {'speedup':>8}")
+        for grid_size in grid_sizes:
+            result = bench_grid(grid_size, BOARD_COUNT, compact)
+            print(
+                f"{result['grid_size']:>5} {result['per_board_boards_per_sec']:>12.0f} "
+                f"{result['batch_boards_per_sec']:>12.0f} {result['speedup']:>7.2f}x"
+            )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_GRID_SIZES)
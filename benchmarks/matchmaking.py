@@ -0,0 +1,133 @@
+# benchmarks/matchmaking.py
+# Simulates players arriving on one grid with random scores and measures how long pairing takes
+# with many players waiting, how far apart paired scores are and how long players wait.
+# Time is simulated, so an hour of traffic runs in seconds.
+#
+# Usage: python -m benchmarks.matchmaking [--rate 200] [--duration 120] [--prefill 0 10000 50000]
+import argparse
+import asyncio
+import random
+import time
+from typing import Dict, List, Optional
+from services.matchmaking import MatchmakingService, SWEEP_INTERVAL
+
+GRID_ID = "10"
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def linear_closest(score: int) -> Optional[object]:
+    # Baseline: scan every waiting player for the closest acceptable score
+    now = MatchmakingService.clock()
+    best = None
+    for ticket in MatchmakingService.tickets.values():
+        diff = abs(ticket.score - score)
+        if diff <= MatchmakingService.band(now - ticket.enqueued_at) and (best is None or diff < abs(best.score - score)):
+            best = ticket
+    return best
+
+
+async def simulate(rate: float, duration: float, prefill: int, score_mean: float, score_std: float,
+                   seed: int) -> Dict:
+    rng = random.Random(seed)
+    clock = SimulatedClock()
+    MatchmakingService.clock = clock
+    MatchmakingService.queues.clear()
+    MatchmakingService.ladders.clear()
+    MatchmakingService.widened.clear()
+    MatchmakingService.tickets.clear()
+
+    def new_score() -> int:
+        return max(0, int(rng.gauss(score_mean, score_std)))
+
+    # Prefilled players are spread far apart so they stay waiting and make the lookups expensive
+    for index in range(prefill):
+        MatchmakingService._enqueue(f"prefill-{index}", GRID_ID, index * 10 ** 6 + 10 ** 9)
+
+    lookup_us: List[float] = []
+    sweep_ms: List[float] = []
+    linear_us: List[float] = []
+    diffs: List[int] = []
+    waits: List[float] = []
+    arrivals = 0
+    next_sweep = SWEEP_INTERVAL
+    while clock.now < duration:
+        clock.now += rng.expovariate(rate)
+        while next_sweep <= clock.now:
+            started = time.perf_counter()
+            swept = MatchmakingService._sweep()
+            sweep_ms.append((time.perf_counter() - started) * 1e3)
+            for first, second in swept:
+                diffs.append(abs(first.score - second.score))
+                waits.extend(next_sweep - ticket.enqueued_at for ticket in (first, second))
+            next_sweep += SWEEP_INTERVAL
+
+        score = new_score()
+        arrivals += 1
+        if arrivals % 500 == 0:  # the baseline is too slow to run on every arrival
+            started = time.perf_counter()
+            linear_closest(score)
+            linear_us.append((time.perf_counter() - started) * 1e6)
+        started = time.perf_counter()
+        opponent = MatchmakingService._take_opponent(GRID_ID, score)
+        if opponent is None:
+            MatchmakingService._enqueue(f"player-{arrivals}", GRID_ID, score)
+        lookup_us.append((time.perf_counter() - started) * 1e6)
+        if opponent is not None:
+            diffs.append(abs(opponent.score - score))
+            waits.extend((clock.now - opponent.enqueued_at, 0.0))
+
+    return {
+        "prefill": prefill,
+        "arrivals": arrivals,
+        "pairs": len(diffs),
+        "still_waiting": len(MatchmakingService.tickets) - prefill,
+        "lookup_us_p50": percentile(lookup_us, 0.5),
+        "lookup_us_p99": percentile(lookup_us, 0.99),
+        "linear_us_p50": percentile(linear_us, 0.5),
+        "sweep_ms_p50": percentile(sweep_ms, 0.5),
+        "score_diff_avg": sum(diffs) / len(diffs) if diffs else 0.0,
+        "score_diff_p95": percentile(diffs, 0.95),
+        "wait_s_avg": sum(waits) / len(waits) if waits else 0.0,
+        "wait_s_p95": percentile(waits, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score-banded matchmaking simulation")
+    parser.add_argument("--rate", type=float, default=200.0, help="arrivals per simulated second")
+    parser.add_argument("--duration", type=float, default=120.0, help="simulated seconds")
+    parser.add_argument("--prefill", type=int, nargs="+", default=[0, 10000, 50000])
+    parser.add_argument("--score-mean", type=float, default=1500.0)
+    parser.add_argument("--score-std", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.rate:.0f} arrivals/s for {args.duration:.0f}s, band {MatchmakingService.band_base}"
+          f" + {MatchmakingService.band_growth}/s")
+    print(f"{'waiting':>8} {'pairs':>8} {'p50 us':>8} {'p99 us':>8} {'scan us':>8} {'sweep ms':>8}"
+          f" {'diff avg':>9} {'diff p95':>9} {'wait avg':>9} {'wait p95':>9}")
+    for prefill in args.prefill:
+        result = asyncio.run(simulate(args.rate, args.duration, prefill, args.score_mean, args.score_std, args.seed))
+        print(
+            f"{result['prefill']:>8} {result['pairs']:>8} {result['lookup_us_p50']:>8.1f} "
+            f"{result['lookup_us_p99']:>8.1f} {result['linear_us_p50']:>8.1f} {result['sweep_ms_p50']:>8.2f} {result['score_diff_avg']:>9.1f} "
+            f"{result['score_diff_p95']:>9.0f} {result['wait_s_avg']:>8.2f}s {result['wait_s_p95']:>8.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/placement.py
+# Usage: python -m benchmarks.placement [grid_size ...]
+import random
+import sys
+import time
+from services.game_service import GameService
+from services.placement import InfeasibleFleetError, PlacementEngine
+
+DEFAULT_GRID_SIZES = [5, 10, 20, 30, 50, 100]
+
+
+def bench_grid(grid_size: int, rounds: int) -> dict:
+    board_size = grid_size ** 2
+    timings = []
+    infeasible = 0
+    for _ in range(rounds):
+        ships = GameService._generate_ships(board_size, grid_size)
+        start = time.perf_counter()
+        try:
+            PlacementEngine(grid_size).place_fleet(ships)
+        except InfeasibleFleetError:
+            infeasible += 1
+        timings.append(time.perf_counter() - start)
+
+    # Worst case for the engine: a fleet of full-width rows on an otherwise empty board
+    worst_fleet = [{"size": (1, grid_size)} for _ in range(grid_size)]
+    start = time.perf_counter()
+    PlacementEngine(grid_size).place_fleet(worst_fleet)
+    worst = time.perf_counter() - start
+
+    timings.sort()
+    return {
+        "grid_size": grid_size,
+        "rounds": rounds,
+        "mean_ms": sum(timings) / rounds * 1000,
+        "p99_ms": timings[int(rounds * 0.99) - 1] * 1000,
+        "max_ms": timings[-1] * 1000,
+        "full_rows_ms": worst * 1000,
+        "infeasible_fleets": infeasible,
+    }
+
+
+def main(grid_sizes):
+    random.seed(0)
+    print(f"{'grid':>5} {'mean ms':>10} {'p99 ms':>10} {'max ms':>10} {'full rows ms':>13} {'infeasible':>11}")
+    for grid_size in grid_sizes:
+        result = bench_grid(grid_size, rounds=200 if grid_size <= 50 else 20)
+        print(
+            f"{result['grid_size']:>5} {result['mean_ms']:>10.3f} {result['p99_ms']:>10.3f} "
+            f"{result['max_ms']:>10.3f} {result['full_rows_ms']:>13.3f} {result['infeasible_fleets']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_GRID_SIZES)
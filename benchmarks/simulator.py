@@ -0,0 +1,218 @@
+# benchmarks/simulator.py
+# Plays complete games straight through GameService (no FastAPI, no Mongo) and reports
+# engine throughput as JSON.
+#
+# Usage: python -m benchmarks.simulator --games 2000 --grid-size 10 20 --workers 4 \
+#            --strategies hunt random --berserk-ratio 0.7 [--seed 1] [--legacy] [--output results.json]
+# Boards are packed (CompactBoard), as live games hold them; --legacy plays on `cells` rows instead.
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from models.game import GameState
+from services.coordinates import Position
+from services.game_service import GameService
+
+MAX_SHOTS_PER_CELL = 4  # safety stop; every game ends well before this
+
+
+class RandomStrategy:
+    # Fires at cells it has not tried yet, in random order
+    def __init__(self, grid_size: int, rng: random.Random):
+        self.targets = [[row, col] for row in range(grid_size) for col in range(grid_size)]
+        rng.shuffle(self.targets)
+
+    def next_shot(self) -> Position:
+        return self.targets.pop() if self.targets else [0, 0]
+
+    def observe(self, position: Position, result: Dict):
+        pass
+
+
+class SweepStrategy(RandomStrategy):
+    # Row by row, left to right
+    def __init__(self, grid_size: int, rng: random.Random):
+        self.targets = [[row, col] for row in reversed(range(grid_size)) for col in reversed(range(grid_size))]
+
+
+class HuntStrategy(RandomStrategy):
+    # Random hunting; after a hit, keeps firing at the cell until it is destroyed, then at its neighbours
+    def __init__(self, grid_size: int, rng: random.Random):
+        super().__init__(grid_size, rng)
+        self.grid_size = grid_size
+        self.queue: List[List[int]] = []
+        self.tried = set()
+
+    def next_shot(self) -> Position:
+        if self.queue:
+            return self.queue.pop()
+        while self.targets:
+            target = self.targets.pop()
+            if tuple(target) not in self.tried:
+                return target
+        return [0, 0]
+
+    def observe(self, position: Position, result: Dict):
+        row, col = position
+        self.tried.add((row, col))
+        if not result["hit"]:
+            return
+        if not result["destroyed"]:
+            self.queue.append([row, col])
+            return
+        for r, c in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+            if 0 <= r < self.grid_size and 0 <= c < self.grid_size and (r, c) not in self.tried:
+                self.tried.add((r, c))
+                self.queue.append([r, c])
+
+
+STRATEGIES = {
+    "random": RandomStrategy,
+    "sweep": SweepStrategy,
+    "hunt": HuntStrategy,
+}
+
+
+def new_game(grid_size: int, berserk_ratio: float, rng: random.Random, compact: bool = True) -> Dict:
+    board_size = grid_size ** 2
+    players = ["p1", "p2"]
+    return {
+        "grid_id": str(grid_size),
+        "players": players,
+        "boards": {
+            p_id: GameService.create_board(board_size, rng.random() < berserk_ratio, seed=rng.getrandbits(63),
+                                           compact=compact)
+            for p_id in players
+        },
+        "state": GameState.IN_PROGRESS,
+        "current_turn": players[0],
+        "winner": None,
+        "score": None,
+    }
+
+
+def play_game(game: Dict, strategies: Dict[str, object]) -> int:
+    grid_size = int(game["grid_id"])
+    shots = 0
+    while game["state"] != GameState.FINISHED and shots < MAX_SHOTS_PER_CELL * 2 * grid_size ** 2:
+        player_id = game["current_turn"]
+        strategy = strategies[player_id]
+        position = strategy.next_shot()
+        strategy.observe(position, GameService.apply_shot(game, player_id, position))
+        shots += 1
+    return shots
+
+
+def game_rng(seed: int, index: int) -> random.Random:
+    # Each game draws from its own stream, so results do not depend on how games are split across workers
+    return random.Random(f"{seed}:{index}")
+
+
+def run_games(grid_size: int, first_game: int, games: int, berserk_ratio: float, strategy_names: Tuple[str, str],
+              seed: int, compact: bool = True) -> Dict:
+    totals = {"games": 0, "shots": 0, "board_seconds": 0.0, "play_seconds": 0.0, "draws": 0,
+              "wins": {name: 0 for name in ("p1", "p2")}}
+    for index in range(first_game, first_game + games):
+        rng = game_rng(seed, index)
+        started = time.perf_counter()
+        game = new_game(grid_size, berserk_ratio, rng, compact)
+        created = time.perf_counter()
+        strategies = {
+            p_id: STRATEGIES[name](grid_size, random.Random(rng.getrandbits(63)))
+            for p_id, name in zip(game["players"], strategy_names)
+        }
+        totals["shots"] += play_game(game, strategies)
+        totals["board_seconds"] += created - started
+        totals["play_seconds"] += time.perf_counter() - created
+        totals["games"] += 1
+        if game["winner"] == "draw":
+            totals["draws"] += 1
+        elif game["winner"]:
+            totals["wins"][game["winner"]] += 1
+    return totals
+
+
+def measure_game_memory(grid_size: int, berserk_ratio: float, seed: int, compact: bool = True) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    game = new_game(grid_size, berserk_ratio, random.Random(seed), compact)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del game
+    return size
+
+
+def simulate(grid_size: int, games: int, workers: int, berserk_ratio: float,
+             strategy_names: Tuple[str, str], seed: int, compact: bool = True) -> Dict:
+    chunks = [games // workers + (1 if i < games % workers else 0) for i in range(workers)]
+    chunks = [chunk for chunk in chunks if chunk]
+    firsts = [sum(chunks[:index]) for index in range(len(chunks))]
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+        futures = [
+            pool.submit(run_games, grid_size, first, chunk, berserk_ratio, strategy_names, seed, compact)
+            for first, chunk in zip(firsts, chunks)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - started
+
+    shots = sum(result["shots"] for result in results)
+    board_seconds = sum(result["board_seconds"] for result in results)
+    play_seconds = sum(result["play_seconds"] for result in results)
+    return {
+        "grid_size": grid_size,
+        "games": games,
+        "workers": len(chunks),
+        "berserk_ratio": berserk_ratio,
+        "strategies": list(strategy_names),
+        "seed": seed,
+        "boards": "packed" if compact else "legacy",
+        "wall_seconds": elapsed,
+        "games_per_sec": games / elapsed,
+        "shots_per_sec": shots / elapsed,
+        "shots_per_game": shots / games,
+        # Per-core costs, summed over workers
+        "board_creation_us": board_seconds / (2 * games) * 1e6,
+        "shot_us": play_seconds / shots * 1e6 if shots else 0.0,
+        "memory_per_game_bytes": measure_game_memory(grid_size, berserk_ratio, seed, compact),
+        "wins": {name: sum(result["wins"][p_id] for result in results)
+                 for p_id, name in zip(("p1", "p2"), ("p1_" + strategy_names[0], "p2_" + strategy_names[1]))},
+        "draws": sum(result["draws"] for result in results),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Headless battleship engine simulator")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--grid-size", type=int, nargs="+", default=[10])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--berserk-ratio", type=float, default=0.7)
+    parser.add_argument("--strategies", nargs=2, choices=sorted(STRATEGIES), default=["hunt", "random"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--legacy", action="store_true", help="play on `cells` rows instead of packed boards")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": sys.version.split()[0],
+        "results": [
+            simulate(grid_size, args.games, max(1, args.workers), args.berserk_ratio,
+                     tuple(args.strategies), args.seed, not args.legacy)
+            for grid_size in args.grid_size
+        ],
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# benchmarks/storage.py
+# Plays games through GameService and persists them the way the server does, through GameStore:
+# every shot is recorded as an event, flushes append the events and write versioned documents
+# and snapshots every snapshot_every events. The engine and the storage backend are timed
+# separately; memory:// gives the floor, a mongodb URL gives the real cost.
+#
+# Usage: python -m benchmarks.storage --storage memory:// mongodb://localhost:27017/battleship_bench \
+#            --games 200 --grid-size 10 --flush-every 1 50 --snapshot-every 50 [--concurrent 20] [--seed 0]
+# The benchmark drops the collections of the database it is pointed at.
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+from benchmarks.simulator import STRATEGIES, MAX_SHOTS_PER_CELL, new_game
+from models.game import GameState
+from services.database import Database
+from services.game_service import GameService
+from services.game_store import GameStore
+
+COUNTERS = ("flushes", "events_written", "games_written", "snapshots_written", "full_writes", "flush_errors")
+
+
+async def persist_games(url: str, grid_size: int, games: int, flush_every: int, snapshot_every: int,
+                        concurrent: int, seed: int) -> Dict:
+    # `concurrent` games are played in turns, one shot each, and GameStore is flushed every
+    # flush_every shots across all of them, as its flush loop would be under load
+    await Database.connect_db(url)
+    await Database.backend.drop_all()
+    await Database.ensure_indexes()
+    GameStore.snapshot_every = snapshot_every
+    before = {name: GameStore.counters[name] for name in COUNTERS}
+    rng = random.Random(seed)
+    engine_seconds = storage_seconds = 0.0
+    shots = unflushed = 0
+    limit = MAX_SHOTS_PER_CELL * 2 * grid_size ** 2
+    active: List[Dict] = []  # {"game", "strategies", "shots"}
+    started_games = 0
+    try:
+        while started_games < games or active:
+            while started_games < games and len(active) < concurrent:
+                game = new_game(grid_size, 0.7, rng)
+                strategies = {p_id: STRATEGIES["hunt"](grid_size, random.Random(rng.getrandbits(63)))
+                              for p_id in game["players"]}
+                started = time.perf_counter()
+                stored = GameService.to_legacy_game(game)  # packed boards are unpacked for storage, as in start_game
+                await Database.create_game(stored)
+                game["_id"] = stored["_id"]
+                storage_seconds += time.perf_counter() - started
+                GameStore.add(game)
+                active.append({"game": game, "strategies": strategies, "shots": 0})
+                started_games += 1
+
+            for playing in list(active):
+                game = playing["game"]
+                started = time.perf_counter()
+                player_id = game["current_turn"]
+                delta: Dict = {}
+                position = playing["strategies"][player_id].next_shot()
+                result = GameService.apply_shot(game, player_id, position, delta)
+                playing["strategies"][player_id].observe(position, result)
+                GameStore.record(game, [(player_id, position)], delta)
+                engine_seconds += time.perf_counter() - started
+                playing["shots"] += 1
+                shots += 1
+                unflushed += 1
+                if game["state"] == GameState.FINISHED or playing["shots"] >= limit:
+                    active.remove(playing)
+                    started = time.perf_counter()
+                    if game["state"] == GameState.FINISHED:
+                        await GameStore.finish(str(game["_id"]))
+                    else:
+                        await GameStore.flush([str(game["_id"])], snapshot=True)
+                        GameStore._forget(str(game["_id"]))
+                    storage_seconds += time.perf_counter() - started
+                if unflushed >= flush_every:
+                    started = time.perf_counter()
+                    await GameStore.flush()
+                    storage_seconds += time.perf_counter() - started
+                    unflushed = 0
+        started = time.perf_counter()
+        await GameStore.flush(snapshot=True)
+        storage_seconds += time.perf_counter() - started
+        await Database.backend.drop_all()
+    finally:
+        await Database.close_db()
+    written = {name: GameStore.counters[name] - before[name] for name in COUNTERS}
+    return {
+        "storage": url,
+        "grid_size": grid_size,
+        "games": games,
+        "concurrent": concurrent,
+        "shots_per_flush": flush_every,
+        "snapshot_every": snapshot_every,
+        "shots": shots,
+        **written,
+        "engine_us_per_shot": engine_seconds / shots * 1e6 if shots else 0.0,
+        "storage_us_per_shot": storage_seconds / shots * 1e6 if shots else 0.0,
+        "storage_us_per_flush": storage_seconds / written["flushes"] * 1e6 if written["flushes"] else 0.0,
+        "games_per_sec": games / (engine_seconds + storage_seconds),
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Persistence cost per storage backend")
+    parser.add_argument("--storage", nargs="+", default=["memory://"])
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--grid-size", type=int, nargs="+", default=[10])
+    parser.add_argument("--flush-every", type=int, nargs="+", default=[1, 50])
+    parser.add_argument("--snapshot-every", type=int, nargs="+", default=[50])
+    parser.add_argument("--concurrent", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    report = {
+        "python": sys.version.split()[0],
+        "results": [
+            asyncio.run(persist_games(url, grid_size, args.games, max(1, flush_every), max(1, snapshot_every),
+                                      max(1, args.concurrent), args.seed))
+            for url in args.storage
+            for grid_size in args.grid_size
+            for flush_every in args.flush_every
+            for snapshot_every in args.snapshot_every
+        ],
+    }
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == "__main__":
+    main()
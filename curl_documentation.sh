@@ -14,6 +14,9 @@ curl -X 'POST' \
 #   "_id": "65aa12345678901234567890",
 #   "name": "Player1",
 #   "score": 0,
+#   "wins": 0,
+#   "losses": 0,
+#   "games_played": 0,
 #   "is_online": false,
 #   "created_at": "2024-01-19T10:00:00.000Z",
 #   "updated_at": "2024-01-19T10:00:00.000Z"
@@ -29,6 +32,65 @@ curl -X 'GET' \
 #   "count": 0
 # }
 
+# 2.0.1 List online players, served from memory in player id order.
+# Pass next_cursor back as ?cursor= for the next page; it is null on the last page.
+# A player stays listed for PRESENCE_GRACE seconds after their last socket closes.
+curl -X 'GET' \
+  'http://localhost:8000/players/online?limit=2' \
+  -H 'accept: application/json'
+
+# Expected Response:
+# {
+#   "players": ["65aa12345678901234567890", "65aa12345678901234567891"],
+#   "next_cursor": "65aa12345678901234567891",
+#   "count": 3
+# }
+
+# 2.1 Matchmaking queue metrics
+curl -X 'GET' \
+  'http://localhost:8000/matchmaking/stats' \
+  -H 'accept: application/json'
+
+# Expected Response:
+# {
+#   "queues": {"10": {"depth": 1, "widened": 0, "oldest_wait_seconds": 3.2}},
+#   "waiting": 1,
+#   "queued": 120,
+#   "matched": 58,
+#   "widened_matches": 4,
+#   "bot_games": 2,
+#   "offers": 7,
+#   "cancelled": 3,
+#   "waits": 60,
+#   "wait_seconds": 141.6,
+#   "max_wait_seconds": 21.3,
+#   "avg_wait_seconds": 2.36
+# }
+
+# 2.2 A game's move log: one event per shot, bot shots included, in seq order
+curl -X 'GET' \
+  'http://localhost:8000/games/65aa12345678901234567890/events?after=0&limit=500' \
+  -H 'accept: application/json'
+
+# Expected Response:
+# {
+#   "events": [
+#     {"seq": 1, "player_id": "player1_id", "position": [3, 4], "at": "2024-01-19T10:15:02.118000"},
+#     {"seq": 2, "player_id": "player1_id", "position": "B7", "at": "2024-01-19T10:15:03.540000"}
+#   ]
+# }
+
+# 2.3 Replay: the game as it stood after event `seq` (omit seq for the latest state)
+curl -X 'GET' \
+  'http://localhost:8000/games/65aa12345678901234567890/replay?seq=2' \
+  -H 'accept: application/json'
+
+# Expected Response:
+# {
+#   "seq": 2,
+#   "game": {"id": "65aa12345678901234567890", "boards": {...}, "current_turn": "player2_id", "event_seq": 2, ...}
+# }
+
 # 3. WebSocket Connection (using wscat tool)
 # First, install wscat if not installed:
 # npm install -g wscat
@@ -44,6 +106,8 @@ wscat -c "ws://localhost:8000/ws/65aa12345678901234567890/A1"
   "type": "shot",
   "position": "B3"
 }
+# Rows past Z continue as AA, AB, ... ("AA12"). A zero-based [row, col] pair works too:
+# { "type": "shot", "position": [1, 2] }
 
 # Expected Response:
 # {
@@ -52,6 +116,7 @@ wscat -c "ws://localhost:8000/ws/65aa12345678901234567890/A1"
 #   "hit": true,
 #   "destroyed": false,
 #   "ship_destroyed": false,
+#   "ship_sunk": null,              # {"id": 3, "type": "Q", "size": 4} when the shot sank a ship
 #   "game": {
 #     "_id": "65aa12345678901234567890",
 #     "grid_id": "A1",
@@ -77,27 +142,58 @@ wscat -c "ws://localhost:8000/ws/65aa12345678901234567890/A1"
 #   }
 # }
 
-# 4.2 Request new game
+# 4.1.1 Fire a salvo: shots are applied in order until a miss passes the turn or the game ends
+# In wscat:
+{
+  "type": "salvo",
+  "positions": ["B3", "B4", [1, 4]]
+}
+
+# Expected Response: one shot_result; the top-level position/hit/destroyed describe the last
+# shot applied and "results" lists every shot that was applied
+# {
+#   "type": "shot_result",
+#   "position": "B4",
+#   "hit": false,
+#   "destroyed": false,
+#   "results": [
+#     {"position": "B3", "hit": true, "destroyed": true, "ship_sunk": null},
+#     {"position": "B4", "hit": false, "destroyed": false, "ship_sunk": null}
+#   ],
+#   "game": {...}
+# }
+
+# 4.2 Request new game (after the current game has finished)
 # In wscat:
 {
   "type": "new_game"
 }
 
+# Expected Response: the player is back in the matchmaking queue for this grid;
+# a game_started message follows once an opponent is found
+# {
+#   "type": "queued",
+#   "grid_id": "A1"
+# }
+
+# 4.2.1 Matchmaking offer: sent once after waiting MATCH_MAX_WAIT seconds with nobody to play.
+# From then on players waiting on the nearby grid sizes can also be matched.
+# {
+#   "type": "match_offer",
+#   "bot": true,
+#   "grid_ids": ["9", "11", "8", "12"],
+#   "waited_seconds": 20.0
+# }
+
+# Accept a bot opponent instead of waiting:
+{
+  "type": "play_bot"
+}
+
 # Expected Response:
 # {
-#   "type": "new_game_created",
-#   "game": {
-#     "_id": "65aa12345678901234567891",
-#     "grid_id": "A1",
-#     "state": "waiting",
-#     "players": ["player1_id"],
-#     "boards": {},
-#     "current_turn": null,
-#     "winner": null,
-#     "score": null,
-#     "created_at": "2024-01-19T10:01:00.000Z",
-#     "updated_at": "2024-01-19T10:01:00.000Z"
-#   }
+#   "type": "game_started",
+#   "game": {"players": ["player1_id", "bot:3f2a9c01b7e4"], ...}
 # }
 
 # 4.3 Set berserk mode (when waiting for opponent)
@@ -1,12 +1,27 @@
 # main.py
+import asyncio
+import os
 from contextlib import asynccontextmanager
+from datetime import datetime
 import random
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from typing import Dict, Set
+from bson import ObjectId
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
+from typing import List, Optional, Tuple
 from models.player import Player
-from models.game import Board, Game, GameState
+from models.game import GameState
+from services.archiver import GameArchiver
+from services.board_pool import BoardPool
+from services.bot import Bot
+from services.connections import ConnectionManager
+from services.game_actors import GameActors
 from services.database import Database
+from services.game_log import GameLog
 from services.game_service import GameService
+from services.game_store import GameStore
+from services.matchmaking import MatchmakingService
+from services.player_cache import PlayerCache
+from services.presence import ONLINE_PAGE_LIMIT, PresenceTracker
+from services.score_flusher import ScoreFlusher
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
@@ -19,169 +34,314 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# In-memory storage for active connections
-active_connections: Dict[str, Dict[str, WebSocket]] = {}  # grid_id -> {player_id -> ws}
+CLOSE_POLICY_VIOLATION = 1008  # websocket close code for a player id that is not an ObjectId
+CLOSE_SUPERSEDED = 4000  # websocket close code: a newer connection of the same player took over its wait
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    await Database.connect_db("mongodb://localhost:27017")
-    # Create a unique index on the name field in the players collection
-    await Database.get_collection("players").create_index("name", unique=True)
+    # memory:// runs without MongoDB, e.g. for load tests
+    await Database.connect_db(os.environ.get("BATTLESHIP_STORAGE_URL", "mongodb://localhost:27017"))
+    await Database.ensure_indexes()
+    await BoardPool.start()
+    await GameStore.start()
+    await ScoreFlusher.start()
+    await PresenceTracker.start()
+    await GameArchiver.start()
+    MatchmakingService.configure(start_game)
+    GameActors.configure(apply_move, broadcast_batch)
+    await MatchmakingService.start()
     yield
+    await MatchmakingService.stop()
+    await GameActors.stop()
+    await ConnectionManager.stop()
+    await GameArchiver.stop()
+    await BoardPool.stop()
+    await GameStore.stop()  # flushes every unsaved game
+    await ScoreFlusher.stop()  # and every pending score increment
+    await PresenceTracker.stop()  # marks everyone still here offline
     await Database.close_db()
 
 app.router.lifespan_context = lifespan
 
 @app.post("/players", response_model=Player)
 async def create_player(player: Player):
-    return await Database.create_player(player)
+    return await PlayerCache.create(player)
 
 @app.get("/players/online/count")
 async def get_online_player_count():
-    return {"count": len([ws for grid in active_connections.values() for ws in grid.values()])}
+    return {"count": PresenceTracker.count()}
+
+@app.get("/players/online")
+async def get_online_players(cursor: Optional[str] = None, limit: int = Query(ONLINE_PAGE_LIMIT, ge=1, le=1000)):
+    return PresenceTracker.page(cursor, limit)
+
+@app.get("/players/presence")
+async def get_presence_stats():
+    return PresenceTracker.stats()
+
+@app.get("/players/connections")
+async def get_connection_stats():
+    return ConnectionManager.stats()
+
+@app.get("/players/cache")
+async def get_player_cache_stats():
+    return PlayerCache.stats()
+
+@app.get("/players/scores/pending")
+async def get_score_flusher_stats():
+    return ScoreFlusher.stats()
+
+@app.get("/boards/pool")
+async def get_board_pool_stats():
+    return BoardPool.stats()
+
+@app.get("/games/store")
+async def get_game_store_stats():
+    return GameStore.stats()
+
+@app.get("/games/archive")
+async def get_game_archive_stats():
+    return GameArchiver.stats()
+
+@app.get("/games/actors")
+async def get_game_actor_stats():
+    return GameActors.stats()
+
+@app.get("/games/{game_id}/events")
+async def get_game_events(game_id: str, after: int = Query(0, ge=0), limit: int = Query(500, ge=1, le=5000)):
+    if not ObjectId.is_valid(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    # Unsent events are flushed first so a live game's log is complete
+    if GameStore.events:
+        await GameStore.flush([])
+    events = await Database.get_game_events(game_id, after, after + limit)
+    return {"events": [GameLog.event_view(event) for event in events]}
+
+@app.get("/games/{game_id}/replay")
+async def replay_game(game_id: str, seq: Optional[int] = Query(None, ge=0)):
+    # The game as it stood after event `seq`, rebuilt from the log; the latest state without it
+    if not ObjectId.is_valid(game_id):
+        raise HTTPException(status_code=404, detail="Game not found")
+    if GameStore.events:
+        await GameStore.flush([])
+    game = await GameLog.rebuild(game_id, seq)
+    if game is None:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return {"seq": game.get('event_seq', 0), "game": _game_view(game)}
+
+@app.get("/matchmaking/stats")
+async def get_matchmaking_stats():
+    return MatchmakingService.stats()
 
 @app.websocket("/ws/{player_id}/{grid_id}")
 async def websocket_endpoint(websocket: WebSocket, player_id: str, grid_id: str):
+    if not ObjectId.is_valid(player_id):
+        # Refuse the handshake; an unknown id must not reach presence or matchmaking
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
     await websocket.accept()
     
-    if grid_id not in active_connections:
-        active_connections[grid_id] = {}
-    active_connections[grid_id][player_id] = websocket
+    # Everything sent to this player from now on goes through the connection's send queue
+    ConnectionManager.register(player_id, websocket)
     
     try:
-        player = await Database.get_player(player_id)
-        player['is_online'] = True
-        await Database.update_player(player)
-        
-        games = await Database.get_games(grid_id)
-        game = next(filter(lambda g: len(g['players']) == 1, games), None)
-        game_id = game["_id"] if game else None
-        if not game:
-            # Create new game
-            game = {
-                "grid_id": grid_id,
-                "players": [player_id],
-                "boards": {},
-                "state": GameState.WAITING,
-                "current_turn": None,
-                "winner": None,
-                "score": None
-            }
-            created_game = await Database.create_game(game)
-            game_id = created_game["_id"]
-        elif game['state'] == GameState.WAITING:
-            # Join existing game
-            game['players'].append(player_id)
-            game['state'] = GameState.IN_PROGRESS
-            
-            # Initialize boards
-            for p_id in game["players"]:
-                is_berserk = await _get_player_mode(p_id)
-                game['boards'][p_id] = {
-                    "cells": GameService.create_ship_configuration(int(game["grid_id"]) ** 2),
-                    "missile_count": GameService.calculate_missile_count(int(game["grid_id"]) ** 2, is_berserk),
-                    "is_berserk": is_berserk
-                }
-            
-            game['current_turn'] = game['players'][0]
-            await Database.update_game(game)
-            game['id'] = str(game["_id"]) 
-            del game["_id"]
-            # Notify players
-            await broadcast_to_grid(grid_id, {
-                "type": "game_started",
-                "game": game
-            })
+        PresenceTracker.connect(player_id)
         
         while True:
-            data = await websocket.receive_json()
-            await handle_game_message(grid_id, player_id, data, str(game_id))
+            game, receive = await find_match(websocket, grid_id, player_id)
+            if game is None:
+                await _cancel_receive(receive)
+                await websocket.close(code=CLOSE_SUPERSEDED)
+                return
+            game_id = str(game["_id"])
+            
+            while True:
+                # A read started while waiting for the match is finished before the next one starts
+                data = await (receive if receive is not None else websocket.receive_json())
+                receive = None
+                if data["type"] == "new_game":
+                    game = await GameStore.get(game_id)
+                    if game is None or game["state"] == GameState.FINISHED:
+                        ConnectionManager.send(player_id, {"type": "queued", "grid_id": grid_id})
+                        break
+                    continue
+                # The game's actor applies moves in arrival order and answers the players
+                await GameActors.submit(game_id, player_id, data)
             
     except WebSocketDisconnect:
-        active_connections[grid_id].pop(player_id, None)
-        if not active_connections[grid_id]:
-            del active_connections[grid_id]
-        
-        player['is_online'] = False
-        await Database.update_player(player)
+        pass
+    finally:
+        # Also reached when the connection was closed from our side, e.g. as a slow consumer.
+        # A wait in matchmaking was already withdrawn by find_match; cancelling by player id here
+        # could withdraw the wait of the player's newer connection instead.
+        await ConnectionManager.unregister(player_id, websocket)
         
-async def find_game_with_one_player(games):
-    for game in games:
-        if len(game['players']) == 1:
-            return game
-    return None
-
-async def handle_game_message(grid_id: str, player_id: str, data: dict, game_id: str):
-    game = await Database.get_game(game_id)
+        PresenceTracker.disconnect(player_id)
+
+async def find_match(websocket: WebSocket, grid_id: str, player_id: str) -> Tuple[Optional[dict], Optional[asyncio.Task]]:
+    # Waits in the matchmaking queue while still reading the socket, so a drop cancels the wait
+    # and a "play_bot" reply to a match_offer is picked up. Players are paired by score.
+    # Returns the game, or None when a newer connection of the player took over the wait, along
+    # with the socket read still in flight (or already done), which the caller must await next.
+    player = await PlayerCache.get(player_id)
+    score = player.get('score', 0) if player else 0
+    async def send_offer(message: dict):
+        ConnectionManager.send(player_id, message)
+    
+    match = asyncio.ensure_future(MatchmakingService.match(grid_id, player_id, send_offer, score))
+    receive = None
+    try:
+        while True:
+            if receive is None:
+                receive = asyncio.ensure_future(websocket.receive_json())
+            await asyncio.wait({match, receive}, return_when=asyncio.FIRST_COMPLETED)
+            if match.done():
+                # A message read in the same instant stays with `receive` for the game loop
+                return (None if match.cancelled() else match.result()), receive
+            data = receive.result()
+            receive = None
+            if data.get("type") == "play_bot":
+                match.cancel()
+                return await MatchmakingService.play_bot(grid_id, player_id), None
+    except BaseException:
+        await _cancel_receive(receive)
+        raise
+    finally:
+        match.cancel()
+
+async def _cancel_receive(receive: Optional[asyncio.Task]):
+    # Only one read may be pending on a socket, so an abandoned one is awaited until it has stopped
+    if receive is None:
+        return
+    receive.cancel()
+    await asyncio.gather(receive, return_exceptions=True)
+
+async def start_game(grid_id: str, players: List[str]) -> dict:
+    # Called by MatchmakingService once players are paired; this is the game's first write
+    game = {
+        "grid_id": grid_id,
+        "players": players,
+        "boards": {},
+        "state": GameState.IN_PROGRESS,
+        "current_turn": players[0],
+        "winner": None,
+        "score": None,
+        "seed": GameService.new_seed(),
+        "event_seq": 0,
+        "version": 0
+    }
+    
+    # Initialize boards
+    rng = random.Random(game['seed'])
+    for p_id in game["players"]:
+        is_berserk = await _get_player_mode(p_id, rng)
+        grid_size = int(game["grid_id"])
+        seed, cells = BoardPool.pop(grid_size)
+        game['boards'][p_id] = GameService.create_board(grid_size ** 2, is_berserk, cells, seed, compact=True)
+    
+    # Boards stay packed in memory; only the stored document is unpacked
+    stored = GameService.to_legacy_game(game)
+    await Database.create_game(stored)
+    game['_id'] = stored['_id']
+    GameStore.add(game)
+    # Notify players
+    await broadcast_to_game(game, {
+        "type": "game_started",
+        "game": _game_view(game)
+    })
+    return game
+
+def apply_move(game: dict, player_id: str, data: dict) -> Tuple[List[dict], bool]:
+    # Runs inside the game's actor, which applies one move at a time: returns the messages
+    # for the game's players and whether the game is over
+    if data["type"] not in ("shot", "salvo"):
+        return [], False
+    if game['current_turn'] != player_id or game['state'] == GameState.FINISHED:
+        return [], False
     
+    delta = {}  # only the fields the shots touched are written back
     if data["type"] == "shot":
-        if game['current_turn'] != player_id:
-            return
-        
-        target_id = next(p for p in game['players'] if p != player_id)
-        position = data["position"]
-        
-        hit, destroyed = GameService.process_shot(
-            game['boards'][target_id], 
-            position
+        results = [GameService.apply_shot(game, player_id, data["position"], delta)]
+    else:
+        results = GameService.apply_salvo(game, player_id, data["positions"], delta)
+        if not results:
+            return [], False
+    finished = _record_shots(game, [(player_id, result["position"]) for result in results], results, delta)
+    messages = [_shot_message(game, results, data["type"] == "salvo")]
+    
+    # A bot opponent plays its whole turn right away
+    bot_id = game['current_turn']
+    if game['state'] != GameState.FINISHED and Bot.is_bot(bot_id):
+        # Drawn from the game's seed and position in its log, so the bot plays the same from the same game
+        rng = random.Random(f"{game.get('seed')}:{game['event_seq']}")
+        target_id = next(p for p in game['players'] if p != bot_id)
+        delta, bot_results = {}, []
+        while game['state'] != GameState.FINISHED and game['current_turn'] == bot_id:
+            position = Bot.choose_shot(game['boards'][target_id], rng)
+            bot_results.append(GameService.apply_shot(game, bot_id, position, delta))
+        moves = [(bot_id, result["position"]) for result in bot_results]
+        finished = _record_shots(game, moves, bot_results, delta) or finished
+        messages.append(_shot_message(game, bot_results, True))
+    return messages, finished
+
+def _record_shots(game: dict, moves: List[tuple], results: List[dict], delta: dict) -> bool:
+    # Logs shots just applied to the game; True when they ended it
+    finished = game['state'] == GameState.FINISHED
+    if finished:
+        game['finished_at'] = datetime.utcnow()
+        GameService.merge_delta(delta, {"$set": {"finished_at": game['finished_at']}})
+    # One event per shot; the game document catches up at the next snapshot
+    if not GameStore.record(game, moves, delta):
+        return False
+    if finished:
+        # Player score and counters are $inc-ed in the next bulk flush
+        ScoreFlusher.record_game(
+            game['winner'],
+            [p_id for p_id in game['players'] if not Bot.is_bot(p_id)],
+            sum(result["score"] for result in results)
         )
-        
-        # game['boards'][player_id]['missile_count'] -= 1
-        
-        if not hit:
-            game['current_turn'] = target_id
-            game['boards'][player_id]['missile_count'] -= 1
-        
+    return finished
 
-        if GameService.are_all_ships_destroyed(game['boards'][target_id]):
-            game['state'] = GameState.FINISHED
-            game['winner'] = player_id
-            game['score'] = game['boards'][player_id]['missile_count']
-            
-            # Update player score
-            player = await Database.get_player(player_id)
-            player['score'] += game['score']
-            await Database.update_player(player)
-            
-        if game['boards'][player_id]['missile_count'] == 0 and game['boards'][target_id]['missile_count'] == 0:
-            game['state'] = GameState.FINISHED
-            game['winner'] = 'draw'
-            game['score'] = 0
-        
-        await Database.update_game(game)
-        game['id'] = str(game["_id"]) 
-        del game["_id"]
-        await broadcast_to_grid(grid_id, {
-            "type": "shot_result",
-            "position": position,
-            "hit": hit,
-            "destroyed": destroyed,
-            "game": game
-        })
-    
-    elif data["type"] == "new_game":
-        if game["state"] == GameState.FINISHED:
-            new_game = {
-                "grid_id": grid_id,
-                "players": [player_id],
-                "boards": {},
-                "state": GameState.WAITING
-            }
-            await Database.create_game(new_game)
-            
-            await broadcast_to_grid(grid_id, {
-                "type": "new_game_created",
-                "game": new_game
-            })
+def _shot_message(game: dict, results: List[dict], salvo: bool) -> dict:
+    # A salvo is reported as one shot_result; the top-level fields describe its last shot
+    last = results[-1]
+    message = {
+        "type": "shot_result",
+        "position": last["position"],
+        "hit": last["hit"],
+        "destroyed": last["destroyed"],
+        "ship_destroyed": last["ship_sunk"] is not None,
+        "ship_sunk": last["ship_sunk"],
+        "game": _game_view(game)
+    }
+    if salvo:
+        message["results"] = [
+            {key: r[key] for key in ("position", "hit", "destroyed", "ship_sunk")} for r in results
+        ]
+    return message
+
+def _game_view(game: dict) -> dict:
+    # Outbound copy of a game with its ObjectId as a string `id` and its datetimes (finished_at)
+    # as ISO strings, so every message stays plain JSON. Boards are unpacked into fresh `cells`
+    # rows: the actor goes on playing the same game before a batch's messages are encoded,
+    # and each must show its own state.
+    view = {
+        key: value.isoformat() if isinstance(value, datetime) else value
+        for key, value in GameService.to_legacy_game(game).items() if key != "_id"
+    }
+    view['id'] = str(game["_id"])
+    return view
+
+async def broadcast_to_game(game: dict, message: dict):
+    await broadcast_batch(game, [message])
 
-async def broadcast_to_grid(grid_id: str, message: dict):
-    if grid_id in active_connections:
-        for websocket in active_connections[grid_id].values():
-            await websocket.send_json(message)
+async def broadcast_batch(game: dict, messages: List[dict]):
+    # Only queues the messages; each connection's writer task sends them
+    ConnectionManager.broadcast(game["players"], messages)
 
-async def _get_player_mode(player_id: str) -> bool:
+async def _get_player_mode(player_id: str, rng: random.Random = random) -> bool:
     # Return True 70% of the time and False 30% of the time
-    return random.random() < 0.7
+    return rng.random() < 0.7
 
 if __name__ == "__main__":
     import uvicorn
@@ -23,6 +23,11 @@ class Board(MongoBaseModel):
     cells: Dict[str, Cell]  # position -> cell
     missile_count: int
     is_berserk: bool = False
+    remaining_health: Optional[int] = None  # total ship health left, kept up to date by process_shot
+    ship_health: Dict[str, int] = Field(default_factory=dict)  # cell type -> health left
+    seed: Optional[int] = None  # regenerates the ship layout via GameService.regenerate_board
+    ship_ids: List[List[int]] = Field(default_factory=list)  # cell -> ship id, 0 for sea
+    ships: List[Dict] = Field(default_factory=list)  # {id, type, size, remaining}; ids start at 1
 
 class Game(MongoBaseModel):
     grid_id: str
@@ -32,5 +37,9 @@ class Game(MongoBaseModel):
     current_turn: Optional[str]  # player_id
     winner: Optional[str]  # player_id
     score: Optional[int]
+    seed: Optional[int] = None  # drives per-game random choices such as player modes
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None  # finished games move to games_archive some time after this
+    event_seq: int = 0  # seq of the last game_events entry applied; see GameLog
+    version: int = 0  # bumped by every stored write; writes are conditional on it
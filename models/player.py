@@ -9,4 +9,7 @@ class Player(MongoBaseModel):
     is_online: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-    score: int = 0
\ No newline at end of file
+    score: int = 0
+    wins: int = 0
+    losses: int = 0
+    games_played: int = 0
\ No newline at end of file
@@ -0,0 +1,91 @@
+# services/archiver.py
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from services.database import Database
+from services.game_log import GameLog
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_AFTER = timedelta(hours=1)  # finished games older than this leave the hot collection
+ARCHIVE_INTERVAL = 300.0  # seconds between archive passes
+ARCHIVE_BATCH_SIZE = 500
+ARCHIVE_BATCH_PAUSE = 0.05  # seconds between batches, so a backlog does not hog the database
+
+
+class GameArchiver:
+    # Keeps battleship.games down to waiting and in-progress games. Each pass moves finished
+    # games in batches until none are old enough; a pass that dies halfway is finished by the next one.
+    # Archived boards keep only their seed when it and the game's event log rebuild the cells.
+    archive_after: timedelta = ARCHIVE_AFTER
+    interval: float = ARCHIVE_INTERVAL
+    batch_size: int = ARCHIVE_BATCH_SIZE
+    counters: Dict[str, float] = {
+        "passes": 0,
+        "batches": 0,
+        "games_archived": 0,
+        "games_compacted": 0,
+        "errors": 0,
+        "last_pass_ms": 0.0,
+    }
+    _task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, archive_after: timedelta = ARCHIVE_AFTER, interval: float = ARCHIVE_INTERVAL,
+                    batch_size: int = ARCHIVE_BATCH_SIZE):
+        cls.archive_after = archive_after
+        cls.interval = interval
+        cls.batch_size = batch_size
+        cls._task = asyncio.create_task(cls._archive_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls._task:
+            cls._task.cancel()
+            try:
+                await cls._task
+            except asyncio.CancelledError:
+                pass
+            cls._task = None
+
+    @classmethod
+    async def run_pass(cls) -> int:
+        started = time.perf_counter()
+        finished_before = datetime.utcnow() - cls.archive_after
+        archived = 0
+        while True:
+            moved = await Database.archive_finished_games(finished_before, cls.batch_size, cls._compact)
+            if moved:
+                cls.counters["batches"] += 1
+                cls.counters["games_archived"] += moved
+                archived += moved
+            if moved < cls.batch_size:
+                break
+            await asyncio.sleep(ARCHIVE_BATCH_PAUSE)
+        cls.counters["passes"] += 1
+        cls.counters["last_pass_ms"] = (time.perf_counter() - started) * 1000
+        return archived
+
+    @classmethod
+    async def _compact(cls, game: Dict) -> Dict:
+        # Boards whose seed and event log rebuild them are archived without their cells
+        archived = await GameLog.strip_boards(game)
+        if archived is not game:
+            cls.counters["games_compacted"] += 1
+        return archived
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {"archive_after_seconds": cls.archive_after.total_seconds(), **cls.counters}
+
+    @classmethod
+    async def _archive_loop(cls):
+        while True:
+            try:
+                await cls.run_pass()
+            except Exception:
+                cls.counters["errors"] += 1
+                logger.exception("Game archive pass failed")
+            await asyncio.sleep(cls.interval)
@@ -0,0 +1,138 @@
+# services/board_engine.py
+from array import array
+from models.game import CellType
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# One byte per cell:
+#   bits 0-1  ship kind (0 = sea, 1 = P, 2 = Q)
+#   bits 2-3  remaining health
+#   bit  4    hit flag
+KIND_MASK = 0b00011
+HEALTH_MASK = 0b01100
+HEALTH_SHIFT = 2
+HIT_FLAG = 0b10000
+
+SEA = 0
+KIND_P = 1
+KIND_Q = 2
+
+_KIND_BY_TYPE = {CellType.P: KIND_P, CellType.Q: KIND_Q}
+_TYPE_BY_KIND = {KIND_P: CellType.P.value, KIND_Q: CellType.Q.value}
+_INITIAL_HEALTH = {KIND_P: 1, KIND_Q: 2}
+
+
+def _pack(kind: int, health: int, hit: bool) -> int:
+    return kind | (health << HEALTH_SHIFT) | (HIT_FLAG if hit else 0)
+
+
+# Lookup tables between packed bytes and the legacy "sea" / "sea1" / "P10" / "Q21" strings
+_DECODE = {"sea": _pack(SEA, 0, False), "sea1": _pack(SEA, 0, True)}
+for _kind, _type in _TYPE_BY_KIND.items():
+    for _health in range(_INITIAL_HEALTH[_kind] + 1):
+        for _hit in (0, 1):
+            _DECODE[f"{_type}{_health}{_hit}"] = _pack(_kind, _health, bool(_hit))
+_ENCODE: List[Optional[str]] = [None] * 32
+for _string, _value in _DECODE.items():
+    _ENCODE[_value] = _string
+
+
+class CompactBoard:
+    # ship_ids maps every cell to the id of the ship on it (0 for sea); ids index `ships` from 1
+    __slots__ = ("grid_size", "cells", "ship_ids", "ships")
+
+    def __init__(self, grid_size: int, cells: Optional[bytearray] = None, ship_ids: Optional[array] = None):
+        self.grid_size = grid_size
+        self.cells = cells if cells is not None else bytearray(grid_size * grid_size)
+        self.ship_ids = ship_ids if ship_ids is not None else array("H", bytes(2 * grid_size * grid_size))
+        self.ships: List[Dict] = []
+
+    @classmethod
+    def from_cells(cls, cells: List[List[str]], ship_ids: Optional[List[List[int]]] = None) -> "CompactBoard":
+        grid_size = len(cells)
+        try:
+            packed = bytearray(_DECODE[cell] for row in cells for cell in row)
+        except KeyError as e:
+            raise ValueError(f"Invalid cell {e.args[0]!r}") from None
+        if len(packed) != grid_size * grid_size:
+            raise ValueError("Board cells must be a square matrix")
+        index = array("H", (ship_id for row in ship_ids for ship_id in row)) if ship_ids is not None else None
+        return cls(grid_size, packed, index)
+
+    def ship_id_rows(self) -> List[List[int]]:
+        size = self.grid_size
+        return [self.ship_ids[row * size:(row + 1) * size].tolist() for row in range(size)]
+
+    def to_cells(self) -> List[List[str]]:
+        size = self.grid_size
+        encoded = [_ENCODE[value] for value in self.cells]
+        return [encoded[row * size:(row + 1) * size] for row in range(size)]
+
+    def _add_ship(self, cell_type: CellType, size: int) -> int:
+        ship_id = len(self.ships) + 1
+        self.ships.append({"id": ship_id, "type": CellType(cell_type).value, "size": size})
+        return ship_id
+
+    def place(self, positions: Iterable[Tuple[int, int]], cell_type: CellType) -> int:
+        positions = list(positions)
+        kind = _KIND_BY_TYPE[CellType(cell_type)]
+        value = _pack(kind, _INITIAL_HEALTH[kind], False)
+        ship_id = self._add_ship(cell_type, len(positions))
+        size = self.grid_size
+        for row, col in positions:
+            self.cells[row * size + col] = value
+            self.ship_ids[row * size + col] = ship_id
+        return ship_id
+
+    def place_rect(self, top: int, left: int, height: int, width: int, cell_type: CellType) -> int:
+        kind = _KIND_BY_TYPE[CellType(cell_type)]
+        run = bytes([_pack(kind, _INITIAL_HEALTH[kind], False)]) * width
+        ship_id = self._add_ship(cell_type, height * width)
+        id_run = array("H", [ship_id]) * width
+        size = self.grid_size
+        for row in range(top, top + height):
+            start = row * size + left
+            self.cells[start:start + width] = run
+            self.ship_ids[start:start + width] = id_run
+        return ship_id
+
+    def ship_at(self, row: int, col: int) -> int:
+        return self.ship_ids[row * self.grid_size + col]
+
+    def cell(self, row: int, col: int) -> str:
+        return _ENCODE[self.cells[row * self.grid_size + col]]
+
+    def in_bounds(self, row: int, col: int) -> bool:
+        return 0 <= row < self.grid_size and 0 <= col < self.grid_size
+
+    def shoot(self, row: int, col: int) -> Tuple[bool, bool]:
+        # Same semantics as GameService.process_shot on legacy cells: (hit, cell_destroyed)
+        if not self.in_bounds(row, col):
+            return False, False
+
+        index = row * self.grid_size + col
+        value = self.cells[index]
+
+        if not value & KIND_MASK:
+            self.cells[index] = value | HIT_FLAG  # Mark sea as hit
+            return False, False
+
+        health = (value & HEALTH_MASK) >> HEALTH_SHIFT
+        if health == 0 and value & HIT_FLAG:
+            return False, False  # Already hit
+
+        health -= 1
+        self.cells[index] = (value & KIND_MASK) | (health << HEALTH_SHIFT) | HIT_FLAG
+        return True, health == 0
+
+    def remaining_health(self) -> int:
+        return sum((value & HEALTH_MASK) >> HEALTH_SHIFT for value in self.cells)
+
+    def health_by_type(self) -> Dict[str, int]:
+        health = {cell_type: 0 for cell_type in _TYPE_BY_KIND.values()}
+        for value in self.cells:
+            if value & KIND_MASK:
+                health[_TYPE_BY_KIND[value & KIND_MASK]] += (value & HEALTH_MASK) >> HEALTH_SHIFT
+        return health
+
+    def all_ships_destroyed(self) -> bool:
+        return not any(value & HEALTH_MASK for value in self.cells)
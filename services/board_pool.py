@@ -0,0 +1,118 @@
+# services/board_pool.py
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from services.board_engine import CompactBoard
+from services.game_service import GameService
+from services.placement import InfeasibleFleetError
+
+POOL_GRID_SIZES = (10,)  # the only sizes pooled; boards of any other size are generated on demand
+POOL_TARGET_SIZE = 32
+POOL_LOW_WATER = 8
+
+
+class BoardPool:
+    pools: Dict[int, Deque[Tuple[int, CompactBoard]]] = {}  # grid size -> (seed, ship layout)
+    counters: Dict[int, Dict[str, float]] = {}
+    target_size: int = POOL_TARGET_SIZE
+    low_water: int = POOL_LOW_WATER
+    _refill_needed: Optional[asyncio.Event] = None
+    _refill_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, grid_sizes: Iterable[int] = POOL_GRID_SIZES,
+                    target_size: int = POOL_TARGET_SIZE, low_water: int = POOL_LOW_WATER):
+        cls.target_size = target_size
+        cls.low_water = low_water
+        for grid_size in grid_sizes:
+            cls._track(grid_size)
+        cls._refill_needed = asyncio.Event()
+        cls._refill_needed.set()
+        cls._refill_task = asyncio.create_task(cls._refill_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls._refill_task:
+            cls._refill_task.cancel()
+            try:
+                await cls._refill_task
+            except asyncio.CancelledError:
+                pass
+            cls._refill_task = None
+
+    @classmethod
+    def pop(cls, grid_size: int) -> Tuple[int, CompactBoard]:
+        pool = cls.pools.get(grid_size)
+        if pool is None:
+            # The grid size comes from the URL; pooling every size asked for would let clients grow memory
+            return cls._generate_one(grid_size)
+        if pool:
+            cls.counters[grid_size]["hits"] += 1
+            board = pool.popleft()
+        else:
+            cls.counters[grid_size]["misses"] += 1
+            board = cls._generate_one(grid_size)
+        if len(pool) < cls.low_water and cls._refill_needed:
+            cls._refill_needed.set()
+        return board
+
+    @classmethod
+    def stats(cls) -> Dict[str, Dict]:
+        return {
+            str(grid_size): {
+                "size": len(cls.pools[grid_size]),
+                "target_size": cls.target_size,
+                "low_water": cls.low_water,
+                **cls.counters[grid_size],
+            }
+            for grid_size in cls.pools
+        }
+
+    @classmethod
+    def _track(cls, grid_size: int):
+        if grid_size not in cls.pools:
+            cls.pools[grid_size] = deque()
+            cls.counters[grid_size] = {
+                "hits": 0,
+                "misses": 0,
+                "refills": 0,
+                "boards_generated": 0,
+                "last_refill_ms": 0.0,
+                "max_refill_ms": 0.0,
+            }
+
+    @classmethod
+    async def _refill_loop(cls):
+        while True:
+            await cls._refill_needed.wait()
+            cls._refill_needed.clear()
+            for grid_size, pool in list(cls.pools.items()):
+                if len(pool) >= cls.low_water and cls.counters[grid_size]["refills"]:
+                    continue
+                missing = cls.target_size - len(pool)
+                if missing <= 0:
+                    continue
+                started = time.perf_counter()
+                # Generation is CPU bound; keep it off the event loop
+                boards = await asyncio.to_thread(cls._generate, grid_size, missing)
+                pool.extend(boards)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                counters = cls.counters[grid_size]
+                counters["refills"] += 1
+                counters["boards_generated"] += len(boards)
+                counters["last_refill_ms"] = elapsed_ms
+                counters["max_refill_ms"] = max(counters["max_refill_ms"], elapsed_ms)
+
+    @staticmethod
+    def _generate_one(grid_size: int) -> Tuple[int, CompactBoard]:
+        seed = GameService.new_seed()
+        return seed, GameService.regenerate_board(grid_size ** 2, seed, compact=True)
+
+    @staticmethod
+    def _generate(grid_size: int, count: int) -> List[Tuple[int, CompactBoard]]:
+        seeds = [GameService.new_seed() for _ in range(count)]
+        try:
+            return list(zip(seeds, GameService.create_ship_configurations(grid_size ** 2, count, compact=True, seeds=seeds)))
+        except InfeasibleFleetError:
+            return []  # the next refill tries again
@@ -0,0 +1,37 @@
+# services/bot.py
+import random
+import uuid
+from typing import Dict, List, Optional
+from services.board_engine import CompactBoard
+
+BOT_PREFIX = "bot:"
+
+
+class Bot:
+    # Server-side opponent offered by matchmaking when nobody else is waiting
+    @staticmethod
+    def new_id() -> str:
+        return f"{BOT_PREFIX}{uuid.uuid4().hex[:12]}"
+
+    @staticmethod
+    def is_bot(player_id: Optional[str]) -> bool:
+        return bool(player_id) and player_id.startswith(BOT_PREFIX)
+
+    @staticmethod
+    def choose_shot(board: Dict, rng: random.Random = random) -> List[int]:
+        # Finishes damaged ships first, otherwise fires at a random untried cell.
+        # Only what a human opponent can see is used: a cell is untried when its hit flag is clear.
+        damaged = []
+        untried = []
+        rows = board['cells'].to_cells() if isinstance(board['cells'], CompactBoard) else board['cells']
+        for row, cells in enumerate(rows):
+            for col, cell in enumerate(cells):
+                if cell == "sea":
+                    untried.append([row, col])
+                elif cell != "sea1":
+                    if cell[2] == "0":
+                        untried.append([row, col])
+                    elif cell[1] != "0":
+                        damaged.append([row, col])
+        targets = damaged or untried
+        return rng.choice(targets) if targets else [0, 0]
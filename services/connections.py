@@ -0,0 +1,208 @@
+# services/connections.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
+from fastapi import WebSocket
+from services.encoding import encode_json
+
+logger = logging.getLogger(__name__)
+
+SEND_QUEUE_SIZE = 256  # outbound messages buffered per connection
+SEND_TIMEOUT = 5.0  # seconds one send may take before the client counts as half-dead
+LATENCY_SAMPLES = 2048  # recent enqueue-to-sent times kept for percentiles
+
+# What happens to a message for a connection whose queue is full:
+# "drop_oldest" discards the oldest queued message (every game message carries the whole game,
+# so a later one supersedes it); "disconnect" closes the connection.
+SLOW_CONSUMER_POLICIES = ("drop_oldest", "disconnect")
+SLOW_CONSUMER_POLICY = "drop_oldest"
+CLOSE_SLOW_CONSUMER = 1013  # websocket close code: try again later
+
+
+class Connection:
+    __slots__ = ("player_id", "websocket", "queue", "writer", "dropped", "closing")
+
+    def __init__(self, player_id: str, websocket: WebSocket):
+        self.player_id = player_id
+        self.websocket = websocket
+        self.queue: Deque[Tuple[float, str]] = deque()  # (enqueued at, encoded message)
+        self.writer: Optional[asyncio.Task] = None
+        self.dropped = 0
+        self.closing = False
+
+
+class ConnectionManager:
+    # Every message to a client goes through its connection's bounded queue, drained by one
+    # writer task per connection. Broadcasting only enqueues, so a slow or dead client delays
+    # nobody else, and never the loop that receives its moves. Messages are queued as encoded
+    # JSON: a broadcast is encoded once and the same text goes to every recipient.
+    connections: Dict[str, Connection] = {}  # player_id -> latest connection
+    queue_size: int = SEND_QUEUE_SIZE
+    send_timeout: float = SEND_TIMEOUT
+    policy: str = SLOW_CONSUMER_POLICY
+    latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+    counters: Dict[str, float] = {
+        "enqueued": 0,
+        "encoded": 0,
+        "encoded_chars": 0,
+        "sent": 0,
+        "dropped": 0,
+        "slow_disconnects": 0,
+        "send_timeouts": 0,
+        "send_errors": 0,
+        "max_depth": 0,
+        "max_send_ms": 0.0,
+    }
+    _wakeups: Dict[Connection, asyncio.Event] = {}
+
+    @classmethod
+    def configure(cls, queue_size: int = SEND_QUEUE_SIZE, send_timeout: float = SEND_TIMEOUT,
+                  policy: str = SLOW_CONSUMER_POLICY):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Unknown slow consumer policy {policy!r}; expected one of {SLOW_CONSUMER_POLICIES}")
+        cls.queue_size = queue_size
+        cls.send_timeout = send_timeout
+        cls.policy = policy
+
+    @classmethod
+    async def stop(cls):
+        connections = list(cls._wakeups)
+        for connection in connections:
+            connection.writer.cancel()
+        await asyncio.gather(*(connection.writer for connection in connections), return_exceptions=True)
+        cls._wakeups.clear()
+        cls.connections.clear()
+
+    @classmethod
+    def register(cls, player_id: str, websocket: WebSocket) -> Connection:
+        # A player's newest socket receives their messages from now on
+        connection = Connection(player_id, websocket)
+        cls._wakeups[connection] = asyncio.Event()
+        connection.writer = asyncio.create_task(cls._write(connection))
+        cls.connections[player_id] = connection
+        return connection
+
+    @classmethod
+    async def unregister(cls, player_id: str, websocket: WebSocket):
+        connection = cls.connections.get(player_id)
+        if connection is not None and connection.websocket is websocket:
+            del cls.connections[player_id]
+        for connection in [c for c in cls._wakeups if c.websocket is websocket]:
+            connection.writer.cancel()
+            try:
+                await connection.writer
+            except asyncio.CancelledError:
+                pass
+
+    @classmethod
+    def send(cls, player_id: str, message: Dict) -> bool:
+        # Queues a message without waiting; False when the player is not connected
+        return cls.send_many(player_id, [message])
+
+    @classmethod
+    def send_many(cls, player_id: str, messages: List[Dict]) -> bool:
+        if player_id not in cls.connections:
+            return False
+        return cls._enqueue(player_id, cls._encode(messages))
+
+    @classmethod
+    def broadcast(cls, player_ids: Iterable[str], messages: List[Dict]):
+        frames = None
+        for player_id in player_ids:
+            if player_id in cls.connections:
+                if frames is None:
+                    frames = cls._encode(messages)
+                cls._enqueue(player_id, frames)
+
+    @classmethod
+    def _encode(cls, messages: List[Dict]) -> List[str]:
+        frames = [encode_json(message) for message in messages]
+        cls.counters["encoded"] += len(frames)
+        cls.counters["encoded_chars"] += sum(len(frame) for frame in frames)
+        return frames
+
+    @classmethod
+    def _enqueue(cls, player_id: str, frames: List[str]) -> bool:
+        connection = cls.connections.get(player_id)
+        if connection is None or connection.closing:
+            return False
+        now = time.perf_counter()
+        for frame in frames:
+            if len(connection.queue) >= cls.queue_size:
+                if cls.policy == "disconnect":
+                    cls._close_slow(connection)
+                    return False
+                connection.queue.popleft()
+                connection.dropped += 1
+                cls.counters["dropped"] += 1
+            connection.queue.append((now, frame))
+        cls.counters["enqueued"] += len(frames)
+        cls.counters["max_depth"] = max(cls.counters["max_depth"], len(connection.queue))
+        cls._wakeups[connection].set()
+        return True
+
+    @classmethod
+    def stats(cls) -> Dict:
+        depths = [len(connection.queue) for connection in cls.connections.values()]
+        latencies = sorted(cls.latencies)
+
+        def percentile(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000 if latencies else 0.0
+
+        return {
+            "connections": len(cls.connections),
+            "policy": cls.policy,
+            "queued": sum(depths),
+            "deepest_queue": max(depths, default=0),
+            "send_ms_p50": percentile(0.5),
+            "send_ms_p99": percentile(0.99),
+            **cls.counters,
+        }
+
+    @classmethod
+    async def _write(cls, connection: Connection):
+        wakeup = cls._wakeups[connection]
+        try:
+            while True:
+                await wakeup.wait()
+                wakeup.clear()
+                while connection.queue:
+                    enqueued_at, frame = connection.queue.popleft()
+                    try:
+                        await asyncio.wait_for(connection.websocket.send_text(frame), cls.send_timeout)
+                    except asyncio.TimeoutError:
+                        cls.counters["send_timeouts"] += 1
+                        cls._close_slow(connection)
+                        return
+                    except Exception:
+                        # The socket is gone; its receive loop will notice and unregister it
+                        cls.counters["send_errors"] += 1
+                        connection.closing = True
+                        return
+                    elapsed = time.perf_counter() - enqueued_at
+                    cls.latencies.append(elapsed)
+                    cls.counters["sent"] += 1
+                    cls.counters["max_send_ms"] = max(cls.counters["max_send_ms"], elapsed * 1000)
+        finally:
+            connection.queue.clear()
+            cls._wakeups.pop(connection, None)
+
+    @classmethod
+    def _close_slow(cls, connection: Connection):
+        # Closing makes the client's receive loop end with WebSocketDisconnect, which cleans up
+        if connection.closing:
+            return
+        connection.closing = True
+        cls.counters["slow_disconnects"] += 1
+        logger.warning("Closing slow connection of %s (%d queued)", connection.player_id, len(connection.queue))
+        connection.queue.clear()
+        asyncio.ensure_future(cls._close(connection.websocket))
+
+    @staticmethod
+    async def _close(websocket: WebSocket):
+        try:
+            await asyncio.wait_for(websocket.close(code=CLOSE_SLOW_CONSUMER), SEND_TIMEOUT)
+        except Exception:
+            pass
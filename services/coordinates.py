@@ -0,0 +1,53 @@
+# services/coordinates.py
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+Position = Union[str, Sequence[int]]  # "B3", "AA12" or [row, col]
+
+
+def row_label(row: int) -> str:
+    # 0 -> "A", 25 -> "Z", 26 -> "AA", 27 -> "AB", ...
+    label = ""
+    row += 1
+    while row:
+        row, remainder = divmod(row - 1, 26)
+        label = chr(65 + remainder) + label
+    return label
+
+
+class CoordinateCodec:
+    _codecs: Dict[int, "CoordinateCodec"] = {}
+
+    def __init__(self, grid_size: int):
+        self.grid_size = grid_size
+        self.row_labels = [row_label(row) for row in range(grid_size)]
+        self.labels: List[List[str]] = [
+            [f"{label}{col + 1}" for col in range(grid_size)] for label in self.row_labels
+        ]
+        self.positions: Dict[str, Tuple[int, int]] = {
+            label: (row, col) for row, labels in enumerate(self.labels) for col, label in enumerate(labels)
+        }
+
+    @classmethod
+    def for_grid(cls, grid_size: int) -> "CoordinateCodec":
+        codec = cls._codecs.get(grid_size)
+        if codec is None:
+            codec = cls._codecs[grid_size] = cls(grid_size)
+        return codec
+
+    def encode(self, row: int, col: int) -> str:
+        return self.labels[row][col]
+
+    def decode(self, position: Position) -> Optional[Tuple[int, int]]:
+        # (row, col) for a label or a [row, col] pair; None when it is not on this grid
+        if isinstance(position, str):
+            return self.positions.get(position)
+        if (
+            isinstance(position, (list, tuple)) and len(position) == 2
+            and all(type(value) is int for value in position)
+            and 0 <= position[0] < self.grid_size and 0 <= position[1] < self.grid_size
+        ):
+            return position[0], position[1]
+        return None
+
+    def is_valid(self, position: Position) -> bool:
+        return self.decode(position) is not None
@@ -1,67 +1,118 @@
 # services/database.py
 from bson import ObjectId
-from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List, Optional
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
 from models.player import Player
 from models.game import Game
+from services.storage.base import ArchiveTransform, StorageBackend
+from services.storage.memory import MemoryBackend
+from services.storage.mongo import MongoBackend
+
+# URL scheme -> storage backend, e.g. mongodb://localhost:27017 or memory://
+BACKENDS = {
+    "mongodb": MongoBackend,
+    "mongodb+srv": MongoBackend,
+    "memory": MemoryBackend,
+}
 
 class Database:
-    client: Optional[AsyncIOMotorClient] = None
+    backend: Optional[StorageBackend] = None
+
+    @classmethod
+    def open_backend(cls, url: str) -> StorageBackend:
+        scheme = url.split("://", 1)[0]
+        if scheme not in BACKENDS:
+            raise ValueError(f"No storage backend for {url!r}; expected one of {sorted(BACKENDS)}")
+        return BACKENDS[scheme](url)
 
     @classmethod
-    async def connect_db(cls, mongodb_url: str):
-        cls.client = AsyncIOMotorClient(mongodb_url)
+    async def connect_db(cls, url: str):
+        cls.backend = cls.open_backend(url)
+        await cls.backend.connect()
         
     @classmethod
     async def close_db(cls):
-        if cls.client:
-            await cls.client.close()
+        if cls.backend:
+            await cls.backend.close()
+            cls.backend = None
+
+    @classmethod
+    async def ensure_indexes(cls):
+        await cls.backend.ensure_indexes()
 
     @classmethod
     async def get_player(cls, player_id: str) -> Optional[Player]:
-        player = await cls.client.battleship.players.find_one({"id": ObjectId(player_id)})
-        return player
+        return await cls.backend.get_player(player_id)
 
     @classmethod
     async def create_player(cls, player: Player) -> Player:
-        await cls.client.battleship.players.insert_one(player.dict())
-        return player
+        return await cls.backend.create_player(player)
 
     @classmethod
     async def update_player(cls, player: Player) -> bool:
-        result = await cls.client.battleship.players.update_one(
-            {"_id": player['id']},
-            {"$set": player}
-        )
-        return result.modified_count > 0
+        return await cls.backend.update_player(player)
+
+    @classmethod
+    async def update_player_fields(cls, player_id: str, fields: Dict) -> bool:
+        return await cls.backend.update_player_fields(player_id, fields)
+
+    @classmethod
+    async def bulk_increment_players(cls, increments: Dict[str, Dict[str, int]]) -> int:
+        # player_id -> {field: amount}, applied with $inc in one unordered bulk write
+        return await cls.backend.bulk_increment_players(increments)
+
+    @classmethod
+    async def bulk_set_players_online(cls, changes: Dict[str, bool]) -> int:
+        return await cls.backend.bulk_set_players_online(changes)
 
     @classmethod
     async def get_games(cls, grid_id: str) -> List[Game]:
-        cursor = cls.client.battleship.games.find({"grid_id": grid_id})
-        games = []
-        async for game in cursor:
-            games.append(game)
-        return games
+        return await cls.backend.get_games(grid_id)
+
+    @classmethod
+    async def get_game(cls, game_id: str) -> Optional[Game]:
+        # Archived games are found too
+        return await cls.backend.get_game(game_id)
 
     @classmethod
-    async def get_game(cls, game_id: str) -> List[Game]:
-        game = await cls.client.battleship.games.find_one({"_id": ObjectId(game_id)})
-        return game
+    async def archive_finished_games(cls, finished_before: datetime, batch_size: int,
+                                     transform: Optional[ArchiveTransform] = None) -> int:
+        return await cls.backend.archive_finished_games(finished_before, batch_size, transform)
     
     @classmethod
     async def create_game(cls, game: Game) -> Game:
-        await cls.client.battleship.games.insert_one(game)
-        return game
+        return await cls.backend.create_game(game)
 
     @classmethod
     async def update_game(cls, game: Game) -> bool:
-        result = await cls.client.battleship.games.update_one(
-            {"_id": game["_id"]},
-            {"$set": game}
-        )
-        return result.modified_count > 0
+        return await cls.backend.update_game(game)
     
     @classmethod
-    def get_collection(cls, collection_name: str):
-        return cls.client.battleship[collection_name]
-    
+    async def update_game_fields(cls, game_id, update: Dict) -> bool:
+        # `update` is a Mongo update document such as {"$set": {...}, "$inc": {...}}
+        return await cls.backend.update_game_fields(game_id, update)
+
+    @classmethod
+    async def bulk_update_games(cls, updates: List[Tuple[ObjectId, Dict]]) -> int:
+        return await cls.backend.bulk_update_games(updates)
+
+    @classmethod
+    async def update_games_versioned(cls, updates: List[Tuple[ObjectId, int, Dict]]) -> List[ObjectId]:
+        # Optimistic concurrency: (game_id, expected version, update); returns the games that had moved on
+        return await cls.backend.update_games_versioned(updates)
+
+    @classmethod
+    async def append_game_events(cls, events: List[Dict]) -> int:
+        return await cls.backend.append_game_events(events)
+
+    @classmethod
+    async def get_game_events(cls, game_id: str, after_seq: int = 0, upto_seq: Optional[int] = None) -> List[Dict]:
+        return await cls.backend.get_game_events(game_id, after_seq, upto_seq)
+
+    @classmethod
+    async def save_game_snapshots(cls, snapshots: List[Dict]) -> int:
+        return await cls.backend.save_game_snapshots(snapshots)
+
+    @classmethod
+    async def get_game_snapshot(cls, game_id: str, upto_seq: Optional[int] = None) -> Optional[Dict]:
+        return await cls.backend.get_game_snapshot(game_id, upto_seq)
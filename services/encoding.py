@@ -0,0 +1,28 @@
+# services/encoding.py
+import json
+from datetime import datetime
+from enum import Enum
+from bson import ObjectId
+
+try:
+    import orjson
+except ImportError:  # the stdlib encoder gives the same JSON, only slower
+    orjson = None
+
+
+def _default(value):
+    # Types found in game and player documents that JSON has no literal for
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def encode_json(message) -> str:
+    # One text frame's worth of JSON, e.g. to send the same message to many sockets
+    if orjson is not None:
+        return orjson.dumps(message, default=_default).decode()
+    return json.dumps(message, default=_default, separators=(",", ":"), ensure_ascii=False)
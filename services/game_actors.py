@@ -0,0 +1,140 @@
+# services/game_actors.py
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from models.game import GameState
+from services.game_store import GameStore
+
+logger = logging.getLogger(__name__)
+
+ACTOR_INBOX_SIZE = 64  # queued moves per game before senders have to wait
+ACTOR_BATCH_SIZE = 32  # moves applied per wake-up, and answered with one broadcast
+ACTOR_IDLE_TIMEOUT = 60.0  # seconds without moves before a game's actor exits
+
+# (game, player_id, message) -> (messages for the game's players, whether the move ended the game)
+ApplyMove = Callable[[Dict, str, Dict], Tuple[List[Dict], bool]]
+Broadcast = Callable[[Dict, List[Dict]], Awaitable[None]]
+
+
+class GameActor:
+    __slots__ = ("game_id", "inbox", "task")
+
+    def __init__(self, game_id: str, inbox_size: int):
+        self.game_id = game_id
+        self.inbox: asyncio.Queue = asyncio.Queue(maxsize=inbox_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+class GameActors:
+    # Each active game is owned by one task that applies its moves in arrival order against the
+    # in-memory game; games never wait on each other. An actor starts with the first move
+    # and exits when its game ends or has been idle for idle_timeout.
+    actors: Dict[str, GameActor] = {}
+    inbox_size: int = ACTOR_INBOX_SIZE
+    batch_size: int = ACTOR_BATCH_SIZE
+    idle_timeout: float = ACTOR_IDLE_TIMEOUT
+    counters: Dict[str, int] = {
+        "started": 0,
+        "stopped_idle": 0,
+        "stopped_finished": 0,
+        "moves": 0,
+        "batches": 0,
+        "max_batch": 0,
+        "inbox_full": 0,
+        "errors": 0,
+    }
+    _apply: Optional[ApplyMove] = None
+    _broadcast: Optional[Broadcast] = None
+
+    @classmethod
+    def configure(cls, apply: ApplyMove, broadcast: Broadcast, inbox_size: int = ACTOR_INBOX_SIZE,
+                  batch_size: int = ACTOR_BATCH_SIZE, idle_timeout: float = ACTOR_IDLE_TIMEOUT):
+        cls._apply = apply
+        cls._broadcast = broadcast
+        cls.inbox_size = inbox_size
+        cls.batch_size = batch_size
+        cls.idle_timeout = idle_timeout
+
+    @classmethod
+    async def stop(cls):
+        actors = list(cls.actors.values())
+        for actor in actors:
+            actor.task.cancel()
+        await asyncio.gather(*(actor.task for actor in actors), return_exceptions=True)
+        cls.actors.clear()
+
+    @classmethod
+    async def submit(cls, game_id: str, player_id: str, data: Dict):
+        # Queues a move for the game's actor, starting one if needed; waits while the inbox is full
+        actor = cls.actors.get(game_id)
+        if actor is None:
+            actor = cls.actors[game_id] = GameActor(game_id, cls.inbox_size)
+            actor.task = asyncio.create_task(cls._run(actor))
+            cls.counters["started"] += 1
+        if actor.inbox.full():
+            cls.counters["inbox_full"] += 1
+        await actor.inbox.put((player_id, data))
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {
+            "actors": len(cls.actors),
+            "queued_moves": sum(actor.inbox.qsize() for actor in cls.actors.values()),
+            **cls.counters,
+        }
+
+    @classmethod
+    async def _run(cls, actor: GameActor):
+        try:
+            while True:
+                try:
+                    move = await asyncio.wait_for(actor.inbox.get(), cls.idle_timeout)
+                except asyncio.TimeoutError:
+                    if actor.inbox.empty():
+                        cls.counters["stopped_idle"] += 1
+                        return
+                    continue
+                batch = [move]
+                while len(batch) < cls.batch_size and not actor.inbox.empty():
+                    batch.append(actor.inbox.get_nowait())
+                try:
+                    if await cls._process(actor.game_id, batch):
+                        cls.counters["stopped_finished"] += 1
+                        return
+                except Exception:
+                    cls.counters["errors"] += 1
+                    logger.exception("Game actor %s failed a batch of %d moves", actor.game_id, len(batch))
+        finally:
+            # Nothing awaits between the idle check and this, so an idle actor leaves no move behind;
+            # one that stops because its game ended only drops moves that game would ignore
+            if cls.actors.get(actor.game_id) is actor:
+                del cls.actors[actor.game_id]
+
+    @classmethod
+    async def _process(cls, game_id: str, batch: List[Tuple[str, Dict]]) -> bool:
+        # Applies a batch of moves and answers it with one broadcast; True once the game is over
+        cls.counters["batches"] += 1
+        cls.counters["moves"] += len(batch)
+        cls.counters["max_batch"] = max(cls.counters["max_batch"], len(batch))
+        game = await GameStore.get(game_id)
+        if game is None:
+            return True
+        outbound, finished = [], False
+        for player_id, data in batch:
+            try:
+                messages, ended = cls._apply(game, player_id, data)
+            except Exception:
+                cls.counters["errors"] += 1
+                logger.exception("Move by %s in game %s failed", player_id, game_id)
+                continue
+            outbound.extend(messages)
+            finished = finished or ended
+        try:
+            if outbound:
+                await cls._broadcast(game, outbound)
+        except Exception:
+            cls.counters["errors"] += 1
+            logger.exception("Broadcast for game %s failed", game_id)
+        if finished:
+            await GameStore.finish(game_id)
+        return finished or game['state'] == GameState.FINISHED
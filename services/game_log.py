@@ -0,0 +1,130 @@
+# services/game_log.py
+from bson import ObjectId
+from datetime import datetime
+from typing import Dict, List, Optional
+from models.game import GameState
+from services.coordinates import Position
+from services.database import Database
+from services.game_service import GameService
+
+SNAPSHOT_EVERY = 50  # events between full-game snapshots
+
+
+class GameLog:
+    # Every shot is an event {game_id, seq, player_id, position, at} in game_events; seq counts
+    # from 1 and game["event_seq"] is the last one applied. Shots are deterministic, so a game at
+    # any seq is its latest snapshot at or before it with the events after it applied in order.
+
+    @staticmethod
+    def shot_event(game: Dict, player_id: str, position: Position, at: datetime) -> Dict:
+        game['event_seq'] = game.get('event_seq', 0) + 1
+        return {
+            "game_id": game["_id"],
+            "seq": game['event_seq'],
+            "player_id": player_id,
+            "position": position,  # as the client sent it, so replays decode it the same way
+            "at": at,
+        }
+
+    @staticmethod
+    def snapshot(game: Dict) -> Dict:
+        return {
+            "game_id": game["_id"],
+            "seq": game.get('event_seq', 0),
+            "at": datetime.utcnow(),
+            "game": GameService.to_legacy_game(game),
+        }
+
+    @staticmethod
+    def replay(game: Dict, events: List[Dict], delta: Optional[Dict] = None) -> Dict:
+        # Applies events in order on top of `game`; events it has already seen are skipped, and so
+        # are shots out of turn, which only a lost race between two writers can leave in the log
+        for event in events:
+            if event["seq"] <= game.get('event_seq', 0):
+                continue
+            if game['state'] != GameState.FINISHED and game['current_turn'] == event["player_id"]:
+                GameService.apply_shot(game, event["player_id"], event["position"], delta)
+            game['event_seq'] = event["seq"]
+            GameService._delta_set(delta, "event_seq", event["seq"])
+            if game['state'] == GameState.FINISHED and not game.get('finished_at'):
+                game['finished_at'] = event["at"]
+                GameService._delta_set(delta, "finished_at", event["at"])
+        return game
+
+    @classmethod
+    async def rebuild(cls, game_id: str, upto_seq: Optional[int] = None) -> Optional[Dict]:
+        # The game as it stood after event `upto_seq` (the latest state when None)
+        snapshot = await Database.get_game_snapshot(game_id, upto_seq)
+        if snapshot is not None:
+            game = snapshot["game"]
+        else:
+            # Games from before the log have no snapshot; their document is the only starting point
+            game = await Database.get_game(game_id)
+            if game is None or (upto_seq is not None and game.get('event_seq', 0) > upto_seq):
+                return None
+            await cls.restore_boards(game)
+        for board in game['boards'].values():
+            GameService.ensure_board_indexes(board)
+        events = await Database.get_game_events(game_id, game.get('event_seq', 0), upto_seq)
+        return cls.replay(game, events)
+
+    @staticmethod
+    def initial_game(game: Dict) -> Optional[Dict]:
+        # The game as it started, rebuilt from its board seeds; None when a board has no seed
+        boards = game['boards'].values()
+        if any(board.get('seed') is None or 'is_berserk' not in board for board in boards):
+            return None
+        board_size = int(game['grid_id']) ** 2
+        initial = {key: value for key, value in game.items() if key not in ('boards', 'finished_at')}
+        initial['boards'] = {
+            player_id: GameService.create_board(
+                board_size, board['is_berserk'], GameService.regenerate_board(board_size, board['seed'], compact=True),
+                board['seed'], compact=True
+            )
+            for player_id, board in game['boards'].items()
+        }
+        initial.update(state=GameState.IN_PROGRESS, current_turn=game['players'][0], winner=None, score=None, event_seq=0)
+        return initial
+
+    @classmethod
+    async def _replay_from_seeds(cls, game: Dict) -> Optional[Dict]:
+        initial = cls.initial_game(game)
+        if initial is None:
+            return None
+        events = await Database.get_game_events(str(game["_id"]), 0, game.get('event_seq', 0))
+        return GameService.to_legacy_game(cls.replay(initial, events))
+
+    @classmethod
+    async def strip_boards(cls, game: Dict) -> Dict:
+        # Archived form of a finished game: boards keep their seed but drop `cells` and `ship_ids`
+        # when the seeds and the event log rebuild both exactly; otherwise the game is kept whole
+        rebuilt = await cls._replay_from_seeds(game)
+        if rebuilt is None or any(
+            rebuilt['boards'][player_id]['cells'] != board.get('cells')
+            or rebuilt['boards'][player_id]['ship_ids'] != board.get('ship_ids', rebuilt['boards'][player_id]['ship_ids'])
+            for player_id, board in game['boards'].items()
+        ):
+            return game
+        stripped = dict(game)
+        stripped['boards'] = {
+            player_id: {key: value for key, value in board.items() if key not in ('cells', 'ship_ids')}
+            for player_id, board in game['boards'].items()
+        }
+        return stripped
+
+    @classmethod
+    async def restore_boards(cls, game: Dict) -> Dict:
+        # Puts back the `cells` and `ship_ids` that strip_boards left out of an archived game
+        if all('cells' in board for board in game['boards'].values()):
+            return game
+        rebuilt = await cls._replay_from_seeds(game)
+        if rebuilt is None:
+            raise ValueError(f"Game {game['_id']} has boards without cells or seeds")
+        for player_id, board in game['boards'].items():
+            board['cells'] = rebuilt['boards'][player_id]['cells']
+            board['ship_ids'] = rebuilt['boards'][player_id]['ship_ids']
+        return game
+
+    @staticmethod
+    def event_view(event: Dict) -> Dict:
+        return {key: value for key, value in event.items() if not isinstance(value, ObjectId)}
@@ -1,11 +1,22 @@
 # services/game_service.py
-from models.game import Game, Board, Cell, CellType, GameState
-from typing import Dict, List, Tuple
+from models.game import CellType, GameState
+from services.board_engine import CompactBoard
+from services.coordinates import CoordinateCodec, Position
+from services.placement import BatchPlacementEngine, InfeasibleFleetError, PlacementEngine
+from typing import Dict, List, Optional, Tuple, Union
+import copy
 import random
 
+MAX_FLEET_COVERAGE = 0.5  # share of the board ships may cover
+MAX_FLEET_ATTEMPTS = 5  # fresh fleets to try before reporting the board as infeasible
+
 class GameService:
     @staticmethod
     def are_all_ships_destroyed(board: Dict) -> bool:
+        if 'remaining_health' in board:
+            return board['remaining_health'] <= 0
+        if isinstance(board['cells'], CompactBoard):
+            return board['cells'].all_ships_destroyed()
         for row in board['cells']:
             for cell in row:
                 if cell.startswith('P') or cell.startswith('Q'):
@@ -15,29 +26,211 @@ class GameService:
         return True
     
     @staticmethod
-    def create_ship_configuration(board_size: int) -> List[List[str]]:
-        cells = {}
+    def create_ship_configuration(
+        board_size: int,
+        compact: bool = False,
+        rng: Optional[random.Random] = None
+    ) -> Union[List[List[str]], CompactBoard]:
         grid_size = int(board_size ** 0.5)
-        ships = GameService._generate_ships(board_size, grid_size)
+        rng = rng or random
+        
+        for attempt in range(MAX_FLEET_ATTEMPTS):
+            ships = GameService._generate_ships(board_size, grid_size, rng)
+            try:
+                placements = PlacementEngine(grid_size, rng).place_fleet(ships)
+                break
+            except InfeasibleFleetError:
+                if attempt == MAX_FLEET_ATTEMPTS - 1:
+                    raise
         
-        for ship in ships:
-            position = GameService._find_random_position(cells, ship["size"], grid_size)
-            for pos in position:
-                cells[pos] = Cell(type=ship["type"], health=ship["health"])
+        board = CompactBoard(grid_size)
+        for ship, positions in zip(ships, placements):
+            board.place(positions, ship["type"])
         
-        # Create a 2D array to represent the board
-        board = [["sea" for _ in range(grid_size)] for _ in range(grid_size)]
+        return board if compact else board.to_cells()
+
+    @staticmethod
+    def new_seed() -> int:
+        return random.getrandbits(63)  # fits a BSON int64
+
+    @staticmethod
+    def regenerate_board(board_size: int, seed: int, compact: bool = False) -> Union[List[List[str]], CompactBoard]:
+        # A board's ship layout is fully determined by its seed
+        return GameService.create_ship_configuration(board_size, compact, random.Random(seed))
+
+    @staticmethod
+    def create_board(
+        board_size: int,
+        is_berserk: bool,
+        cells: Optional[Union[List[List[str]], CompactBoard]] = None,
+        seed: Optional[int] = None,
+        compact: bool = False
+    ) -> Dict:
+        # With compact=True a packed layout stays packed, as live games are played
+        if cells is None:
+            seed = seed if seed is not None else GameService.new_seed()
+            cells = GameService.regenerate_board(board_size, seed, compact=True)
+        packed = isinstance(cells, CompactBoard)
+        board = {
+            "cells": cells.to_cells() if packed and not compact else cells,
+            "missile_count": GameService.calculate_missile_count(board_size, is_berserk),
+            "is_berserk": is_berserk,
+            "seed": seed
+        }
+        if packed:
+            if not compact:
+                board['ship_ids'] = cells.ship_id_rows()
+            board['ships'] = [{**ship, "remaining": ship["size"]} for ship in cells.ships]
+        GameService.ensure_board_indexes(board)
+        return board
+
+    @staticmethod
+    def ensure_board_indexes(board: Dict) -> Dict:
+        GameService.ensure_health_counters(board)
+        GameService.ensure_ship_index(board)
+        return board
+
+    @staticmethod
+    def ensure_health_counters(board: Dict) -> Dict:
+        # Boards stored before the counters existed get them computed once, on load
+        if 'remaining_health' in board and 'ship_health' in board:
+            return board
+        cells = board['cells']
+        if isinstance(cells, CompactBoard):
+            ship_health = cells.health_by_type()
+        else:
+            ship_health = {CellType.P.value: 0, CellType.Q.value: 0}
+            for row in cells:
+                for cell in row:
+                    if cell.startswith('P') or cell.startswith('Q'):
+                        ship_health[cell[0]] += int(cell[1])
+        board['ship_health'] = ship_health
+        board['remaining_health'] = sum(ship_health.values())
+        return board
+
+    @staticmethod
+    def ensure_ship_index(board: Dict) -> Dict:
+        # Boards stored before ships had ids get the cell -> ship index computed once, on load
+        if 'ships' in board and ('ship_ids' in board or isinstance(board['cells'], CompactBoard)):
+            return board
+        cells = board['cells']
+        rows = cells.to_cells() if isinstance(cells, CompactBoard) else cells
+        grid_size = len(rows)
         
-        for row in range(grid_size):
-            for col in range(grid_size):
-                pos = f"{chr(65 + row)}{col + 1}"
-                if pos in cells:
-                    cell = cells[pos]
-                    board[row][col] = f"{cell.type}{GameService.get_initial_health(cell.type)}0"  # Initial health and hit status
-                else:
-                    board[row][col] = "sea"
+        ship_ids, ships = None, None
+        if board.get('seed') is not None:
+            # The seed reproduces the original placement, ids included
+            layout = GameService.regenerate_board(grid_size ** 2, board['seed'], compact=True)
+            layout_rows = layout.to_cells()
+            if all(
+                layout_rows[r][c][0] == rows[r][c][0] for r in range(grid_size) for c in range(grid_size)
+            ):
+                ship_ids, ships = layout.ship_id_rows(), layout.ships
+        if ship_ids is None:
+            ship_ids, ships = GameService._label_ships(rows)
         
+        remaining = [0] * len(ships)
+        for r in range(grid_size):
+            for c in range(grid_size):
+                if ship_ids[r][c] and int(rows[r][c][1]) > 0:
+                    remaining[ship_ids[r][c] - 1] += 1
+        board['ships'] = [{**ship, "remaining": left} for ship, left in zip(ships, remaining)]
+        if isinstance(cells, CompactBoard):
+            cells.ship_ids = CompactBoard.from_cells(rows, ship_ids).ship_ids
+        else:
+            board['ship_ids'] = ship_ids
         return board
+
+    @staticmethod
+    def _label_ships(rows: List[List[str]]) -> Tuple[List[List[int]], List[Dict]]:
+        # Without a seed, touching cells of the same type are taken to be one ship
+        grid_size = len(rows)
+        ship_ids = [[0] * grid_size for _ in range(grid_size)]
+        ships = []
+        for r in range(grid_size):
+            for c in range(grid_size):
+                cell_type = rows[r][c][0]
+                if cell_type not in (CellType.P.value, CellType.Q.value) or ship_ids[r][c]:
+                    continue
+                ship_id = len(ships) + 1
+                ship_ids[r][c] = ship_id
+                stack, size = [(r, c)], 0
+                while stack:
+                    row, col = stack.pop()
+                    size += 1
+                    for nr, nc in ((row - 1, col), (row + 1, col), (row, col - 1), (row, col + 1)):
+                        if (0 <= nr < grid_size and 0 <= nc < grid_size and not ship_ids[nr][nc]
+                                and rows[nr][nc][0] == cell_type):
+                            ship_ids[nr][nc] = ship_id
+                            stack.append((nr, nc))
+                ships.append({"id": ship_id, "type": cell_type, "size": size})
+        return ship_ids, ships
+
+    @staticmethod
+    def create_ship_configurations(
+        board_size: int,
+        count: int,
+        compact: bool = False,
+        seeds: Optional[List[int]] = None
+    ) -> List[Union[List[List[str]], CompactBoard]]:
+        # Many boards in one batched placement pass; same distribution as create_ship_configuration.
+        # With seeds, board i is identical to regenerate_board(board_size, seeds[i]).
+        grid_size = int(board_size ** 0.5)
+        rngs = [random.Random(seed) for seed in seeds] if seeds is not None else [random] * count
+        if BatchPlacementEngine.lane_typecode(grid_size) is None:
+            return [GameService.create_ship_configuration(board_size, compact, rng) for rng in rngs]
+        
+        fleets = [GameService._generate_ships(board_size, grid_size, rng) for rng in rngs]
+        placements = BatchPlacementEngine(grid_size).place_fleets(fleets, rngs)
+        
+        boards = []
+        for ships, rects, rng in zip(fleets, placements, rngs):
+            if rects is None:
+                # Fleet did not fit; redraw it on the per-board path
+                boards.append(GameService.create_ship_configuration(board_size, True, rng))
+                continue
+            board = CompactBoard(grid_size)
+            for ship, (top, left, height, width) in zip(ships, rects):
+                board.place_rect(top, left, height, width, ship["type"])
+            boards.append(board)
+        
+        return boards if compact else [board.to_cells() for board in boards]
+
+    @staticmethod
+    def to_compact_board(board: Dict) -> Dict:
+        # Board dict with packed cells, for in-memory play; other fields are kept as-is
+        if isinstance(board['cells'], CompactBoard):
+            return board
+        compact = {key: value for key, value in board.items() if key != 'ship_ids'}
+        compact['cells'] = CompactBoard.from_cells(board['cells'], board.get('ship_ids'))
+        return compact
+
+    @staticmethod
+    def to_legacy_board(board: Dict) -> Dict:
+        # Copy of a board dict in the stored/broadcast `cells` layout; shares nothing with `board`
+        if not isinstance(board['cells'], CompactBoard):
+            return copy.deepcopy(board)
+        legacy = copy.deepcopy({key: value for key, value in board.items() if key != 'cells'})
+        legacy['cells'] = board['cells'].to_cells()
+        if 'ships' in board:
+            legacy['ship_ids'] = board['cells'].ship_id_rows()
+        return legacy
+
+    @staticmethod
+    def to_compact_game(game: Dict) -> Dict:
+        # Packs the game's boards in place; live games are played on packed boards
+        for player_id, board in game['boards'].items():
+            game['boards'][player_id] = GameService.to_compact_board(board)
+        return game
+
+    @staticmethod
+    def to_legacy_game(game: Dict) -> Dict:
+        # Copy of a game as it is stored and sent: boards in the `cells` layout
+        legacy = {key: copy.deepcopy(value) for key, value in game.items() if key != 'boards'}
+        legacy['boards'] = {
+            player_id: GameService.to_legacy_board(board) for player_id, board in game['boards'].items()
+        }
+        return legacy
     
     @staticmethod
     def get_initial_health(cell_type: CellType) -> int:
@@ -49,51 +242,28 @@ class GameService:
             raise ValueError("Invalid cell type")
 
     @staticmethod
-    def _generate_ships(board_size: int, grid_size) -> List[Dict[str, Tuple[int, int]]]:
+    def _generate_ships(board_size: int, grid_size, rng: random.Random = random) -> List[Dict[str, Tuple[int, int]]]:
         # Proportionally determine the number and size of ships based on board size
         num_ships = max(1, board_size // 10)
+        # Keep the fleet's total area within a share of the board so it can be placed
+        area_left = max(1, int(board_size * MAX_FLEET_COVERAGE))
         ships = []
         for _ in range(num_ships):
-            ship_type = random.choice([CellType.P, CellType.Q])
-            ship_size = (random.randint(1, grid_size), random.randint(1, grid_size))
+            if area_left <= 0:
+                break
+            ship_type = rng.choice([CellType.P, CellType.Q])
+            ship_size = (rng.randint(1, grid_size), rng.randint(1, grid_size))
+            ship_size = (ship_size[0], max(1, min(ship_size[1], area_left // ship_size[0])))
+            if ship_size[0] * ship_size[1] > area_left:
+                ship_size = (1, area_left)
+            area_left -= ship_size[0] * ship_size[1]
             health = 1 if ship_type == CellType.P else 2
             ships.append({"size": ship_size, "type": ship_type, "health": health})
         return ships
 
     @staticmethod
-    def _find_random_position(
-        existing_cells: Dict[str, Cell], 
-        size: Tuple[int, int],
-        grid_size: int
-    ) -> List[str]:
-        while True:
-            start_row = random.randint(0, grid_size - size[0])
-            start_col = random.randint(0, grid_size - size[1])
-            is_horizontal = random.choice([True, False])
-            
-            positions = []
-            for i in range(size[0]):
-                for j in range(size[1]):
-                    if is_horizontal:
-                        pos = f"{chr(65 + start_row + i)}{start_col + j + 1}"
-                    else:
-                        pos = f"{chr(65 + start_row + j)}{start_col + i + 1}"
-                    
-                    if (pos in existing_cells or 
-                        not GameService._is_valid_position(pos, grid_size)):
-                        break
-                    positions.append(pos)
-            
-            if len(positions) == size[0] * size[1]:
-                return positions
-
-    @staticmethod
-    def _is_valid_position(pos: str, grid_size: int) -> bool:
-        return (
-            len(pos) >= 2 and
-            'A' <= pos[0] < chr(65 + grid_size) and
-            1 <= int(pos[1:]) <= grid_size
-        )
+    def _is_valid_position(pos: Position, grid_size: int) -> bool:
+        return CoordinateCodec.for_grid(grid_size).is_valid(pos)
 
     @staticmethod
     def calculate_missile_count(board_size: int, is_berserk: bool) -> int:
@@ -101,34 +271,136 @@ class GameService:
         return base_count // 2 if is_berserk else base_count
 
     @staticmethod
-    def process_shot(board: Dict, position: str) -> Tuple[bool, bool]:
-        row = ord(position[0]) - 65  # Convert 'A' to 0, 'B' to 1, etc.
-        col = int(position[1:]) - 1  # Convert '1' to 0, '2' to 1, etc.
-        
-        if row < 0 or row >= len(board['cells']) or col < 0 or col >= len(board['cells'][0]):
-            return False, False  # Invalid position
+    def process_shot(board: Dict, position: Position) -> Tuple[bool, bool]:
+        result = GameService.fire(board, position)
+        return result["hit"], result["destroyed"]
 
-        # board['missile_count'] -= 1
-        
-        cell = board['cells'][row][col]
+    @staticmethod
+    def fire(board: Dict, position: Position, delta: Optional[Dict] = None, path: str = "") -> Dict:
+        # Like process_shot, and also reports the ship the shot sank, if any.
+        # With a delta, every field changed is also recorded there as a Mongo update under `path`.
+        missed = {"hit": False, "destroyed": False, "ship_sunk": None}
+        cells = board['cells']
+        grid_size = cells.grid_size if isinstance(cells, CompactBoard) else len(cells)
+        coordinates = CoordinateCodec.for_grid(grid_size).decode(position)  # "B3", "AA12" or [row, col]
+        if coordinates is None:
+            return missed  # Invalid position
+        row, col = coordinates
         
-        if cell == 'sea' or cell == 'sea1':
-            board['cells'][row][col] = 'sea1'  # Mark sea as hit
-            return False, False
+        if isinstance(cells, CompactBoard):
+            hit, cell_destroyed = cells.shoot(row, col)
+            GameService._delta_set(delta, f"{path}cells.{row}.{col}", cells.cell(row, col))
+            if not hit:
+                return missed
+            GameService._record_hit(board, cells.cell(row, col)[0], delta, path)
+            ship_id = cells.ship_at(row, col)
+        else:
+            cell = cells[row][col]
+            
+            if cell == 'sea' or cell == 'sea1':
+                cells[row][col] = 'sea1'  # Mark sea as hit
+                GameService._delta_set(delta, f"{path}cells.{row}.{col}", 'sea1')
+                return missed
+
+            cell_type = cell[0]
+            health = int(cell[1])
+            hit_flag = int(cell[2])
 
-        cell_type = cell[0]
-        health = int(cell[1])
-        hit_flag = int(cell[2])
+            if health == 0 and hit_flag == 1:
+                return missed  # Already hit
 
-        if health == 0 and hit_flag == 1:
-            return False, False  # Already hit
+            health -= 1
+            hit_flag = 1
+            cells[row][col] = f"{cell_type}{health}{hit_flag}"
+            GameService._delta_set(delta, f"{path}cells.{row}.{col}", cells[row][col])
+            GameService._record_hit(board, cell_type, delta, path)
+            
+            cell_destroyed = health == 0
+            ship_id = board['ship_ids'][row][col] if 'ship_ids' in board else 0
+        
+        ship_sunk = None
+        if cell_destroyed and ship_id and 'ships' in board:
+            ship = board['ships'][ship_id - 1]
+            ship['remaining'] -= 1
+            GameService._delta_inc(delta, f"{path}ships.{ship_id - 1}.remaining", -1)
+            if ship['remaining'] == 0:
+                ship_sunk = {"id": ship["id"], "type": ship["type"], "size": ship["size"]}
+        
+        return {"hit": True, "destroyed": cell_destroyed, "ship_sunk": ship_sunk}
 
-        health -= 1
-        hit_flag = 1
-        new_cell = f"{cell_type}{health}{hit_flag}"
-        board['cells'][row][col] = new_cell
-        # board['missile_count'] += 1
+    @staticmethod
+    def apply_shot(game: Dict, player_id: str, position: Position, delta: Optional[Dict] = None) -> Dict:
+        # Applies one shot by the player whose turn it is and updates turn, missiles and outcome.
+        # With a delta, the changes are also recorded there as a minimal Mongo update.
+        target_id = next(p for p in game['players'] if p != player_id)
+        
+        shot = GameService.fire(game['boards'][target_id], position, delta, f"boards.{target_id}.")
+        hit = shot["hit"]
+        
+        if not hit:
+            game['current_turn'] = target_id
+            game['boards'][player_id]['missile_count'] -= 1
+            GameService._delta_set(delta, "current_turn", target_id)
+            GameService._delta_inc(delta, f"boards.{player_id}.missile_count", -1)
         
-        cell_destroyed = health == 0
+        won = GameService.are_all_ships_destroyed(game['boards'][target_id])
+        score = 0
+        if won:
+            game['state'] = GameState.FINISHED
+            game['winner'] = player_id
+            game['score'] = score = game['boards'][player_id]['missile_count']
         
-        return True, cell_destroyed
\ No newline at end of file
+        if game['boards'][player_id]['missile_count'] == 0 and game['boards'][target_id]['missile_count'] == 0:
+            game['state'] = GameState.FINISHED
+            game['winner'] = 'draw'
+            game['score'] = 0
+        
+        if won or game['state'] == GameState.FINISHED:
+            for key in ('state', 'winner', 'score'):
+                GameService._delta_set(delta, key, game[key])
+        
+        # `score` is what the shooter earns, even if the draw rule overrode the game's score
+        return {"position": position, **shot, "won": won, "score": score}
+
+    @staticmethod
+    def apply_salvo(
+        game: Dict,
+        player_id: str,
+        positions: List[Position],
+        delta: Optional[Dict] = None
+    ) -> List[Dict]:
+        # Shots are applied in order until the turn passes or the game ends
+        results = []
+        for position in positions:
+            if game['current_turn'] != player_id or game['state'] == GameState.FINISHED:
+                break
+            results.append(GameService.apply_shot(game, player_id, position, delta))
+        return results
+
+    @staticmethod
+    def merge_delta(into: Dict, delta: Dict) -> Dict:
+        # Folds a later delta into an earlier one: $set values are replaced, $inc amounts add up
+        for path, value in delta.get("$set", {}).items():
+            into.setdefault("$set", {})[path] = value
+        for path, amount in delta.get("$inc", {}).items():
+            GameService._delta_inc(into, path, amount)
+        return into
+
+    @staticmethod
+    def _delta_set(delta: Optional[Dict], path: str, value) -> None:
+        if delta is not None:
+            delta.setdefault("$set", {})[path] = value
+
+    @staticmethod
+    def _delta_inc(delta: Optional[Dict], path: str, amount: int) -> None:
+        if delta is not None:
+            inc = delta.setdefault("$inc", {})
+            inc[path] = inc.get(path, 0) + amount
+
+    @staticmethod
+    def _record_hit(board: Dict, cell_type: str, delta: Optional[Dict] = None, path: str = "") -> None:
+        if 'remaining_health' in board:
+            board['remaining_health'] -= 1
+            board['ship_health'][cell_type] -= 1
+            GameService._delta_inc(delta, f"{path}remaining_health", -1)
+            GameService._delta_inc(delta, f"{path}ship_health.{cell_type}", -1)
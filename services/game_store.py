@@ -0,0 +1,366 @@
+# services/game_store.py
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from models.game import GameState
+from services.coordinates import Position
+from services.database import Database
+from services.game_log import SNAPSHOT_EVERY, GameLog
+from services.game_service import GameService
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 0.5  # seconds between write-behind flushes
+FLUSH_EVENT_THRESHOLD = 256  # flush early once this many events are unsent
+GAME_IDLE_TIMEOUT = 600.0  # seconds without moves before an unfinished game is written out and leaves memory
+
+
+class GameStore:
+    # Active games live here and are the source of truth. Each flush appends the new moves to
+    # game_events; a game's document is only rewritten, and snapshotted, every snapshot_every
+    # events or when it finishes. Loading a game replays whatever the log has past its document.
+    # Another process writing the same game shows up as a clash on an event seq or on the
+    # document's `version`; the game is then either rewritten or reloaded from storage.
+    # Boards are held packed (CompactBoard) and only turned back into `cells` rows when written.
+    games: Dict[str, Dict] = {}  # game_id -> game document
+    # game_id -> Mongo update ({"$set": ..., "$inc": ...}) not yet applied to the stored document,
+    # or None when the whole document must be written
+    dirty: Dict[str, Optional[Dict]] = {}
+    events: List[Dict] = []  # unsent events, in order
+    snapshots: List[Dict] = []  # unsent snapshots
+    snapshot_seq: Dict[str, int] = {}  # game_id -> event_seq of its stored document
+    touched: Dict[str, float] = {}  # game_id -> monotonic time it was last read or played
+    flush_interval: float = FLUSH_INTERVAL
+    event_threshold: int = FLUSH_EVENT_THRESHOLD
+    snapshot_every: int = SNAPSHOT_EVERY
+    idle_timeout: float = GAME_IDLE_TIMEOUT
+    counters: Dict[str, int] = {
+        "loads": 0,
+        "events_replayed": 0,
+        "flushes": 0,
+        "events_written": 0,
+        "games_written": 0,
+        "snapshots_written": 0,
+        "full_writes": 0,
+        "flush_errors": 0,
+        "version_conflicts": 0,
+        "event_conflicts": 0,
+        "conflict_retries": 0,
+        "conflict_reloads": 0,
+        "stale_moves": 0,
+        "idle_evictions": 0,
+    }
+    _loading: Dict[str, asyncio.Future] = {}
+    _flush_needed: Optional[asyncio.Event] = None
+    _flush_lock: Optional[asyncio.Lock] = None
+    _flusher: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, flush_interval: float = FLUSH_INTERVAL, event_threshold: int = FLUSH_EVENT_THRESHOLD,
+                    snapshot_every: int = SNAPSHOT_EVERY, idle_timeout: float = GAME_IDLE_TIMEOUT):
+        cls.flush_interval = flush_interval
+        cls.event_threshold = event_threshold
+        cls.snapshot_every = snapshot_every
+        cls.idle_timeout = idle_timeout
+        cls._flush_needed = asyncio.Event()
+        cls._flush_lock = asyncio.Lock()
+        cls._flusher = asyncio.create_task(cls._flush_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls._flusher:
+            cls._flusher.cancel()
+            try:
+                await cls._flusher
+            except asyncio.CancelledError:
+                pass
+            cls._flusher = None
+        # Stored documents are left current, so the next start replays nothing
+        await cls.flush(snapshot=True)
+
+    @classmethod
+    async def get(cls, game_id: str) -> Optional[Dict]:
+        game = cls.games.get(game_id)
+        if game is not None:
+            cls.touched[game_id] = time.monotonic()
+            return game
+        # Concurrent first reads of a game share one query
+        loading = cls._loading.get(game_id)
+        if loading is None:
+            loading = cls._loading[game_id] = asyncio.ensure_future(cls._load(game_id))
+            loading.add_done_callback(lambda _: cls._loading.pop(game_id, None))
+        return await asyncio.shield(loading)
+
+    @classmethod
+    async def _load(cls, game_id: str) -> Optional[Dict]:
+        game = await Database.get_game(game_id)
+        if game is None:
+            return None
+        await GameLog.restore_boards(game)
+        cls.counters["loads"] += 1
+        indexed = all('ships' in board and 'remaining_health' in board for board in game['boards'].values())
+        for board in game['boards'].values():
+            GameService.ensure_board_indexes(board)
+        GameService.to_compact_game(game)
+        stored_seq = game.setdefault('event_seq', 0)
+        game.setdefault('version', 0)
+        # Moves logged after the document was last written
+        events = await Database.get_game_events(game_id, stored_seq)
+        if game_id in cls.games:
+            return cls.games[game_id]
+        delta = {}
+        GameLog.replay(game, events, delta)
+        cls.counters["events_replayed"] += len(events)
+        cls.games[game_id] = game
+        cls.snapshot_seq[game_id] = stored_seq
+        cls.touched[game_id] = time.monotonic()
+        if not indexed:
+            # Counters computed on load are not in Mongo yet; deltas can only $inc them once they are
+            cls.mark_dirty(game_id)
+        elif delta:
+            cls.mark_dirty(game_id, delta)
+        return game
+
+    @classmethod
+    def add(cls, game: Dict) -> Dict:
+        # Registers a game that is already persisted, e.g. right after create_game.
+        # Its starting position is the first snapshot.
+        game_id = str(game["_id"])
+        if game_id in cls.games:
+            return cls.games[game_id]
+        game.setdefault('event_seq', 0)
+        game.setdefault('version', 0)
+        GameService.to_compact_game(game)
+        cls.games[game_id] = game
+        cls.snapshot_seq[game_id] = game['event_seq']
+        cls.touched[game_id] = time.monotonic()
+        cls.snapshots.append(GameLog.snapshot(game))
+        return game
+
+    @classmethod
+    def record(cls, game: Dict, moves: List[Tuple[str, Position]], delta: Dict) -> bool:
+        # Logs shots already applied to the game, in order, along with the update they made.
+        # Call it before awaiting anything, so moves from two messages for one game cannot interleave.
+        game_id = str(game["_id"])
+        if cls.games.get(game_id) is not game:
+            # The game was reloaded after a conflict while these shots were being played
+            cls.counters["stale_moves"] += len(moves)
+            return False
+        cls.touched[game_id] = time.monotonic()
+        at = datetime.utcnow()
+        cls.events.extend(GameLog.shot_event(game, player_id, position, at) for player_id, position in moves)
+        GameService.merge_delta(delta, {"$set": {"event_seq": game['event_seq']}})
+        cls.mark_dirty(game_id, delta)
+        if len(cls.events) >= cls.event_threshold and cls._flush_needed:
+            cls._flush_needed.set()
+        return True
+
+    @classmethod
+    def mark_dirty(cls, game_id: str, delta: Optional[Dict] = None):
+        # Without a delta the whole document is rewritten on the next flush
+        if delta is None:
+            cls.dirty[game_id] = None
+        elif game_id not in cls.dirty:
+            cls.dirty[game_id] = delta
+        elif cls.dirty[game_id] is not None:
+            GameService.merge_delta(cls.dirty[game_id], delta)
+
+    @classmethod
+    async def finish(cls, game_id: str):
+        # Finished games are written immediately and leave memory
+        await cls.flush([game_id])
+        if game_id not in cls.dirty:
+            cls._forget(game_id)
+
+    @classmethod
+    async def evict_idle(cls):
+        # Abandoned games would otherwise stay in memory for good. Idle ones are written in full
+        # and snapshotted, then dropped; a later get() loads them again.
+        deadline = time.monotonic() - cls.idle_timeout
+        idle = [game_id for game_id, touched in cls.touched.items() if touched <= deadline]
+        if not idle:
+            return
+        await cls.flush(idle, snapshot=True)
+        for game_id in idle:
+            # Kept when the write failed, or when the game was played while it was being written
+            if game_id not in cls.dirty and cls.touched.get(game_id, deadline) <= deadline:
+                cls._forget(game_id)
+                cls.counters["idle_evictions"] += 1
+
+    @classmethod
+    async def flush(cls, game_ids: Optional[Iterable[str]] = None, snapshot: bool = False):
+        # Appends every unsent event, then writes the documents (and snapshots) of the games among
+        # game_ids that are due one; with snapshot=True every changed game is due
+        async with cls._flush_lock or asyncio.Lock():
+            # Events go first, so a document or snapshot is never ahead of the log
+            events, cls.events = cls.events, []
+            if events:
+                try:
+                    inserted = await Database.append_game_events(events)
+                    if inserted < len(events):
+                        await cls._check_events(events)
+                except Exception:
+                    cls.counters["flush_errors"] += 1
+                    cls.events = events + cls.events
+                    logger.exception("Appending %d game events failed", len(events))
+                    return
+                cls.counters["events_written"] += inserted
+
+            ids = list(cls.dirty) if game_ids is None else [game_id for game_id in game_ids if game_id in cls.dirty]
+            pending = {
+                game_id: cls.dirty.pop(game_id) for game_id in ids
+                if snapshot or cls._snapshot_due(game_id, cls.dirty[game_id])
+            }
+            updates = []
+            snapshots, cls.snapshots = cls.snapshots, []
+            taken = {}  # game_id -> snapshot of the state being written
+            for game_id, delta in pending.items():
+                game = cls.games.get(game_id)
+                if game is None:
+                    continue
+                if delta is None:
+                    delta = cls._full_write(game)
+                updates.append((game["_id"], game['version'], delta))
+                taken[game_id] = GameLog.snapshot(game)
+            if not updates and not snapshots:
+                cls.counters["flushes"] += 1 if events else 0
+                return
+            try:
+                conflicts = {str(game_id) for game_id in await Database.update_games_versioned(updates)}
+            except Exception:
+                cls.counters["flush_errors"] += 1
+                # Nothing was written: changes made since are merged back on top of the failed ones
+                cls.snapshots = snapshots + cls.snapshots
+                for game_id, delta in pending.items():
+                    if game_id not in cls.games:
+                        continue
+                    newer = cls.dirty.pop(game_id, {})
+                    cls.dirty[game_id] = delta
+                    if newer is None or delta is None:
+                        cls.dirty[game_id] = None
+                    elif newer:
+                        GameService.merge_delta(delta, newer)
+                logger.exception("Write-behind flush of %d games failed", len(updates))
+                return
+            for game_id in pending:
+                if game_id in cls.games and game_id not in conflicts:
+                    cls.games[game_id]['version'] += 1
+            snapshots += [snapshot_doc for game_id, snapshot_doc in taken.items() if game_id not in conflicts]
+            try:
+                await Database.save_game_snapshots(snapshots)
+            except Exception:
+                # Snapshots are history only; they are retried, and skipped where they did get saved
+                cls.counters["flush_errors"] += 1
+                cls.snapshots = snapshots + cls.snapshots
+                snapshots = []
+                logger.exception("Saving game snapshots failed")
+            for game_id in conflicts:
+                try:
+                    await cls._resolve_conflict(game_id)
+                except Exception:
+                    # Written in full, against whatever version is stored by then, on the next flush
+                    cls.mark_dirty(game_id)
+                    logger.exception("Resolving a version conflict on game %s failed", game_id)
+            for snapshot_doc in snapshots:
+                cls.snapshot_seq[str(snapshot_doc["game_id"])] = snapshot_doc["seq"]
+            cls.counters["flushes"] += 1
+            cls.counters["games_written"] += len(updates) - len(conflicts)
+            cls.counters["snapshots_written"] += len(snapshots)
+
+    @classmethod
+    def _snapshot_due(cls, game_id: str, delta: Optional[Dict]) -> bool:
+        game = cls.games.get(game_id)
+        return (
+            game is None
+            or delta is None
+            or game.get('state') == GameState.FINISHED
+            or game.get('event_seq', 0) - cls.snapshot_seq.get(game_id, 0) >= cls.snapshot_every
+        )
+
+    @classmethod
+    def _full_write(cls, game: Dict) -> Dict:
+        # Snapshot on the event loop; the driver encodes documents off-thread.
+        # The version is only ever bumped by the conditional update itself.
+        cls.counters["full_writes"] += 1
+        stored = GameService.to_legacy_game(game)
+        del stored['version']
+        return {"$set": stored}
+
+    @classmethod
+    async def _check_events(cls, events: List[Dict]):
+        # Some events were already stored. Resent ones (after a failed flush) match what is stored;
+        # anything else means another process played those seqs first.
+        by_game: Dict[str, Dict[int, Tuple]] = {}
+        for event in events:
+            by_game.setdefault(str(event["game_id"]), {})[event["seq"]] = (event["player_id"], event["position"])
+        for game_id, ours in by_game.items():
+            stored = await Database.get_game_events(game_id, min(ours) - 1, max(ours))
+            if any(ours.get(event["seq"]) != (event["player_id"], event["position"]) for event in stored):
+                cls.counters["event_conflicts"] += 1
+                cls._reload(game_id)
+
+    @classmethod
+    async def _resolve_conflict(cls, game_id: str):
+        # The stored document's version moved under us. If the log holds nothing past our moves, our
+        # state is still the latest and is rewritten over the newer version straight away;
+        # otherwise the game is reloaded from storage.
+        cls.counters["version_conflicts"] += 1
+        game = cls.games.get(game_id)
+        if game is None:
+            return
+        stored = await Database.get_game(game_id)
+        if (
+            stored is not None
+            and stored.get('event_seq', 0) <= game['event_seq']
+            and not await Database.get_game_events(game_id, game['event_seq'])
+            and cls.games.get(game_id) is game
+        ):
+            version = stored.get('version', 0)
+            if not await Database.update_games_versioned([(game["_id"], version, cls._full_write(game))]):
+                game['version'] = version + 1
+                cls.counters["conflict_retries"] += 1
+                return
+        cls._reload(game_id)
+
+    @classmethod
+    def _reload(cls, game_id: str):
+        # Drops our copy, and anything unsent for it; the next get() loads the stored game
+        cls.counters["conflict_reloads"] += 1
+        cls._forget(game_id)
+        cls.dirty.pop(game_id, None)
+        cls.events = [event for event in cls.events if str(event["game_id"]) != game_id]
+        cls.snapshots = [snapshot for snapshot in cls.snapshots if str(snapshot["game_id"]) != game_id]
+        logger.warning("Game %s was changed by another writer; reloading it", game_id)
+
+    @classmethod
+    def _forget(cls, game_id: str):
+        cls.games.pop(game_id, None)
+        cls.snapshot_seq.pop(game_id, None)
+        cls.touched.pop(game_id, None)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {
+            "active_games": len(cls.games),
+            "dirty_games": len(cls.dirty),
+            "pending_events": len(cls.events),
+            "snapshot_every": cls.snapshot_every,
+            **cls.counters,
+        }
+
+    @classmethod
+    async def _flush_loop(cls):
+        while True:
+            try:
+                await asyncio.wait_for(cls._flush_needed.wait(), cls.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            cls._flush_needed.clear()
+            await cls.flush()
+            # Drop finished games once they are safely written
+            for game_id, game in list(cls.games.items()):
+                if game.get('state') == GameState.FINISHED and game_id not in cls.dirty:
+                    cls._forget(game_id)
+            await cls.evict_idle()
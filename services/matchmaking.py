@@ -0,0 +1,325 @@
+# services/matchmaking.py
+import asyncio
+import itertools
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from services.bot import Bot
+
+MATCH_MAX_WAIT = 20.0  # seconds before a waiting player is offered a bot and nearby grid sizes
+MATCH_GRID_RANGE = 2  # once widened, grid sizes this far from the requested one can match
+SCORE_BAND_BASE = 50  # score difference accepted right away
+SCORE_BAND_GROWTH = 25.0  # extra score difference accepted per second of waiting
+SWEEP_INTERVAL = 1.0  # seconds between passes that pair waiting players whose bands now overlap
+
+StartGame = Callable[[str, List[str]], Awaitable[Dict]]  # (grid_id, players) -> persisted game
+SendOffer = Callable[[Dict], Awaitable[None]]
+LadderEntry = Tuple[int, int, str]  # (score, seq, player_id)
+
+
+class Ticket:
+    __slots__ = ("player_id", "grid_id", "score", "seq", "enqueued_at", "future", "widened")
+
+    def __init__(self, player_id: str, grid_id: str, score: int, seq: int, enqueued_at: float):
+        self.player_id = player_id
+        self.grid_id = grid_id
+        self.score = score
+        self.seq = seq
+        self.enqueued_at = enqueued_at
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.widened = False
+
+
+class MatchmakingService:
+    # Waiting players live only here; a game document is written once two players are paired
+    queues: Dict[str, "OrderedDict[str, Ticket]"] = {}  # grid_id -> player_id -> ticket, oldest first
+    ladders: Dict[str, List[LadderEntry]] = {}  # grid_id -> waiting players sorted by score
+    widened: Dict[str, "OrderedDict[str, Ticket]"] = {}  # grid_id -> tickets that also accept nearby grids
+    tickets: Dict[str, Ticket] = {}  # player_id -> ticket
+    max_wait: Optional[float] = MATCH_MAX_WAIT
+    grid_range: int = MATCH_GRID_RANGE
+    band_base: float = SCORE_BAND_BASE
+    band_growth: float = SCORE_BAND_GROWTH
+    clock: Callable[[], float] = time.monotonic
+    counters: Dict[str, float] = {
+        "queued": 0,
+        "matched": 0,
+        "swept_matches": 0,
+        "widened_matches": 0,
+        "bot_games": 0,
+        "offers": 0,
+        "cancelled": 0,
+        "waits": 0,  # queued players that got a game; wait_seconds is summed over them
+        "wait_seconds": 0.0,
+        "max_wait_seconds": 0.0,
+        "score_diff_total": 0,
+        "max_score_diff": 0,
+    }
+    _start_game: Optional[StartGame] = None
+    _seq = itertools.count()
+    _sweeper: Optional[asyncio.Task] = None
+    _pairing: Set[asyncio.Task] = set()
+
+    @classmethod
+    def configure(cls, start_game: StartGame, max_wait: Optional[float] = MATCH_MAX_WAIT,
+                  grid_range: int = MATCH_GRID_RANGE, band_base: float = SCORE_BAND_BASE,
+                  band_growth: float = SCORE_BAND_GROWTH):
+        cls._start_game = start_game
+        cls.max_wait = max_wait
+        cls.grid_range = grid_range
+        cls.band_base = band_base
+        cls.band_growth = band_growth
+
+    @classmethod
+    async def start(cls, sweep_interval: float = SWEEP_INTERVAL):
+        cls._sweeper = asyncio.create_task(cls._sweep_loop(sweep_interval))
+
+    @classmethod
+    async def stop(cls):
+        if cls._sweeper:
+            cls._sweeper.cancel()
+            try:
+                await cls._sweeper
+            except asyncio.CancelledError:
+                pass
+            cls._sweeper = None
+
+    @classmethod
+    async def match(cls, grid_id: str, player_id: str, send_offer: Optional[SendOffer] = None,
+                    score: int = 0) -> Dict:
+        # Returns the started game. Waits in the grid's queue when nobody close enough in score is there;
+        # the accepted score difference grows with waiting time. After max_wait the player also matches
+        # nearby grid sizes and send_offer is told a bot is available.
+        cls.cancel(player_id)  # one queue entry per player, the newest connection wins
+        opponent = cls._take_opponent(grid_id, score)
+        if opponent is not None:
+            return await cls._pair(opponent, player_id, score, grid_id)
+
+        ticket = cls._enqueue(player_id, grid_id, score)
+        try:
+            if cls.max_wait is not None:
+                try:
+                    return await asyncio.wait_for(asyncio.shield(ticket.future), cls.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+                game = await cls._widen(ticket)
+                if game is not None:
+                    return game
+                if send_offer is not None and not ticket.future.done():
+                    cls.counters["offers"] += 1
+                    await send_offer({
+                        "type": "match_offer",
+                        "bot": True,
+                        "grid_ids": cls._nearby(grid_id),
+                        "waited_seconds": cls.clock() - ticket.enqueued_at,
+                    })
+            return await ticket.future
+        except asyncio.CancelledError:
+            cls.counters["cancelled"] += 1
+            raise
+        finally:
+            cls._dequeue(ticket)
+
+    @classmethod
+    async def play_bot(cls, grid_id: str, player_id: str) -> Dict:
+        cls.cancel(player_id)
+        cls.counters["bot_games"] += 1
+        return await cls._start_game(grid_id, [player_id, Bot.new_id()])
+
+    @classmethod
+    def cancel(cls, player_id: str) -> bool:
+        # Called when a waiting player's socket drops; the waiting match() call raises CancelledError
+        ticket = cls.tickets.get(player_id)
+        if ticket is None:
+            return False
+        cls._dequeue(ticket)
+        ticket.future.cancel()
+        return True
+
+    @classmethod
+    def band(cls, waited: float) -> float:
+        return cls.band_base + cls.band_growth * max(waited, 0.0)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        now = cls.clock()
+        waits = cls.counters["waits"]
+        matched = cls.counters["matched"]
+        return {
+            "queues": {
+                grid_id: {
+                    "depth": len(queue),
+                    "widened": len(cls.widened.get(grid_id, ())),
+                    "oldest_wait_seconds": now - next(iter(queue.values())).enqueued_at,
+                    "min_score": cls.ladders[grid_id][0][0],
+                    "max_score": cls.ladders[grid_id][-1][0],
+                }
+                for grid_id, queue in cls.queues.items()
+            },
+            "waiting": len(cls.tickets),
+            **cls.counters,
+            "avg_wait_seconds": cls.counters["wait_seconds"] / waits if waits else 0.0,
+            "avg_score_diff": cls.counters["score_diff_total"] / matched if matched else 0.0,
+        }
+
+    @classmethod
+    def _enqueue(cls, player_id: str, grid_id: str, score: int) -> Ticket:
+        ticket = Ticket(player_id, grid_id, score, next(cls._seq), cls.clock())
+        cls.queues.setdefault(grid_id, OrderedDict())[player_id] = ticket
+        insort(cls.ladders.setdefault(grid_id, []), (score, ticket.seq, player_id))
+        cls.tickets[player_id] = ticket
+        cls.counters["queued"] += 1
+        return ticket
+
+    @classmethod
+    def _dequeue(cls, ticket: Ticket):
+        if cls.tickets.get(ticket.player_id) is not ticket:
+            return
+        del cls.tickets[ticket.player_id]
+        for index in (cls.queues, cls.widened):
+            queue = index.get(ticket.grid_id)
+            if queue is not None and queue.pop(ticket.player_id, None) is not None and not queue:
+                del index[ticket.grid_id]
+        ladder = cls.ladders[ticket.grid_id]
+        del ladder[bisect_left(ladder, (ticket.score, ticket.seq))]
+        if not ladder:
+            del cls.ladders[ticket.grid_id]
+
+    @classmethod
+    def _take_opponent(cls, grid_id: str, score: int) -> Optional[Ticket]:
+        # Closest score on the same grid whose band (or the arrival's) covers the difference,
+        # else the oldest widened player on a nearby grid
+        ticket = cls._closest(grid_id, score)
+        if ticket is None:
+            for other in cls._nearby(grid_id):
+                queue = cls.widened.get(other)
+                if queue:
+                    ticket = next(iter(queue.values()))
+                    break
+        if ticket is not None:
+            cls._dequeue(ticket)
+        return ticket
+
+    @classmethod
+    def _closest(cls, grid_id: str, score: int) -> Optional[Ticket]:
+        ladder = cls.ladders.get(grid_id)
+        if not ladder:
+            return None
+        now = cls.clock()
+        # Nobody on this grid accepts a difference wider than the oldest ticket's band
+        oldest = next(iter(cls.queues[grid_id].values()))
+        reach = cls.band(now - oldest.enqueued_at)
+        own_band = cls.band(0)
+        # Walk outwards from the arrival's score, nearest first
+        below = bisect_left(ladder, (score,)) - 1
+        above = below + 1
+        while below >= 0 or above < len(ladder):
+            if above >= len(ladder) or (below >= 0 and score - ladder[below][0] <= ladder[above][0] - score):
+                entry = ladder[below]
+                below -= 1
+            else:
+                entry = ladder[above]
+                above += 1
+            diff = abs(entry[0] - score)
+            if diff > reach:
+                return None
+            ticket = cls.tickets[entry[2]]
+            if diff <= max(own_band, cls.band(now - ticket.enqueued_at)):
+                return ticket
+        return None
+
+    @classmethod
+    async def _widen(cls, ticket: Ticket) -> Optional[Dict]:
+        if ticket.future.done() or cls.tickets.get(ticket.player_id) is not ticket:
+            return None
+        # A player already waiting on a nearby grid keeps their grid
+        for other in cls._nearby(ticket.grid_id):
+            queue = cls.queues.get(other)
+            if queue:
+                opponent = next(iter(queue.values()))
+                cls._dequeue(opponent)
+                cls._dequeue(ticket)
+                cls._record_wait(ticket)
+                cls.counters["widened_matches"] += 1
+                return await cls._pair(opponent, ticket.player_id, ticket.score, other)
+        ticket.widened = True
+        cls.widened.setdefault(ticket.grid_id, OrderedDict())[ticket.player_id] = ticket
+        return None
+
+    @classmethod
+    async def _pair(cls, waiting: Ticket, player_id: str, score: int, grid_id: str,
+                    other: Optional[Ticket] = None) -> Dict:
+        # `other` is set when both players were waiting; both futures are then resolved here
+        cls._record_wait(waiting)
+        cls.counters["matched"] += 1
+        diff = abs(waiting.score - score)
+        cls.counters["score_diff_total"] += diff
+        cls.counters["max_score_diff"] = max(cls.counters["max_score_diff"], diff)
+        if waiting.grid_id != grid_id and waiting.widened:
+            cls.counters["widened_matches"] += 1
+        waiters = [waiting] if other is None else [waiting, other]
+        try:
+            game = await cls._start_game(grid_id, [waiting.player_id, player_id])
+        except Exception as e:
+            for ticket in waiters:
+                if not ticket.future.done():
+                    ticket.future.set_exception(e)
+            raise
+        for ticket in waiters:
+            if not ticket.future.done():
+                ticket.future.set_result(game)
+        return game
+
+    @classmethod
+    def _sweep(cls) -> List[Tuple[Ticket, Ticket]]:
+        # Pairs score neighbours whose grown bands now cover their difference; O(n) per grid
+        now = cls.clock()
+        pairs = []
+        for grid_id, ladder in list(cls.ladders.items()):
+            reach = cls.band(now - next(iter(cls.queues[grid_id].values())).enqueued_at)
+            # Only gaps no band can cover yet are skipped without looking at the tickets
+            scores = [entry[0] for entry in ladder]
+            close = [index for index, gap in enumerate(map(int.__sub__, scores[1:], scores)) if gap <= reach]
+            taken = -1
+            for index in close:
+                if index <= taken:
+                    continue
+                first, second = cls.tickets[ladder[index][2]], cls.tickets[ladder[index + 1][2]]
+                if scores[index + 1] - scores[index] <= cls.band(now - min(first.enqueued_at, second.enqueued_at)):
+                    pairs.append((first, second) if first.seq < second.seq else (second, first))
+                    taken = index + 1
+        for first, second in pairs:
+            cls._dequeue(first)
+            cls._dequeue(second)
+        return pairs
+
+    @classmethod
+    async def _sweep_loop(cls, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            for first, second in cls._sweep():
+                cls.counters["swept_matches"] += 1
+                cls._record_wait(second)
+                task = asyncio.create_task(cls._pair(first, second.player_id, second.score, first.grid_id, second))
+                cls._pairing.add(task)
+                task.add_done_callback(cls._pairing.discard)
+
+    @classmethod
+    def _record_wait(cls, ticket: Ticket):
+        waited = cls.clock() - ticket.enqueued_at
+        cls.counters["waits"] += 1
+        cls.counters["wait_seconds"] += waited
+        cls.counters["max_wait_seconds"] = max(cls.counters["max_wait_seconds"], waited)
+
+    @classmethod
+    def _nearby(cls, grid_id: str) -> List[str]:
+        # Other grid sizes within grid_range, closest first
+        try:
+            size = int(grid_id)
+        except ValueError:
+            return []
+        nearby = []
+        for distance in range(1, cls.grid_range + 1):
+            nearby.extend(str(other) for other in (size - distance, size + distance) if other > 0)
+        return nearby
@@ -0,0 +1,217 @@
+# services/placement.py
+#
+# Ship placement over an occupancy mask: one int bitmask per row, bit c set when
+# column c is taken. For a ship of h x w cells every free top-left corner is found
+# with a handful of shifts/ands per row window, and one corner is drawn uniformly
+# from all of them (both orientations), so placement never retries.
+#
+# Worst case per ship is O(G * (h + w)) mask operations on G-bit ints for a G x G
+# grid; _generate_ships asks for at most G*G // 10 ships of up to G x G cells, so a
+# full fleet is bounded by O(G^4 / 10) word operations and always terminates.
+# `python -m benchmarks.placement` prints measured timings per grid size.
+import random
+import sys
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class InfeasibleFleetError(ValueError):
+    def __init__(self, ship_index: int, size: Tuple[int, int], grid_size: int):
+        super().__init__(
+            f"Ship {ship_index} of size {size[0]}x{size[1]} does not fit on the {grid_size}x{grid_size} grid"
+        )
+        self.ship_index = ship_index
+        self.size = size
+        self.grid_size = grid_size
+
+
+class PlacementEngine:
+    def __init__(self, grid_size: int, rng: Optional[random.Random] = None):
+        self.grid_size = grid_size
+        self.rng = rng or random
+        self.full_row = (1 << grid_size) - 1
+        self.rows = [0] * grid_size
+
+    def free_starts(self, height: int, width: int) -> List[int]:
+        # Per top row: bitmask of columns where a height x width ship can start
+        size = self.grid_size
+        if height > size or width > size:
+            return []
+        fits = (1 << (size - width + 1)) - 1
+        starts = []
+        for top in range(size - height + 1):
+            taken = 0
+            for row in self.rows[top:top + height]:
+                taken |= row
+            free = ~taken & self.full_row
+            mask = free & fits
+            for shift in range(1, width):
+                mask &= free >> shift
+            starts.append(mask)
+        return starts
+
+    def find_position(self, size: Tuple[int, int]) -> Optional[List[Tuple[int, int]]]:
+        orientations = [size] if size[0] == size[1] else [size, (size[1], size[0])]
+        candidates = [(shape, self.free_starts(*shape)) for shape in orientations]
+        total = sum(mask.bit_count() for _, starts in candidates for mask in starts)
+        if not total:
+            return None
+
+        pick = self.rng.randrange(total)
+        for (height, width), starts in candidates:
+            for top, mask in enumerate(starts):
+                count = mask.bit_count()
+                if pick >= count:
+                    pick -= count
+                    continue
+                for _ in range(pick):
+                    mask &= mask - 1
+                left = (mask & -mask).bit_length() - 1
+                return [(top + i, left + j) for i in range(height) for j in range(width)]
+
+    def occupy(self, positions: Sequence[Tuple[int, int]]) -> None:
+        for row, col in positions:
+            self.rows[row] |= 1 << col
+
+    def place_fleet(self, ships: List[Dict]) -> List[List[Tuple[int, int]]]:
+        # Largest ships go first, while the board is still open; results keep the fleet's order
+        order = sorted(range(len(ships)), key=lambda i: ships[i]["size"][0] * ships[i]["size"][1], reverse=True)
+        placements = [None] * len(ships)
+        for index in order:
+            positions = self.find_position(ships[index]["size"])
+            if positions is None:
+                raise InfeasibleFleetError(index, ships[index]["size"], self.grid_size)
+            self.occupy(positions)
+            placements[index] = positions
+        return placements
+
+
+# Lane widths for BatchPlacementEngine: array typecode holding one board row per item
+_LANE_TYPECODES = [(8, "B"), (16, "H"), (32, "I"), (64, "Q")]
+
+
+class BatchPlacementEngine:
+    # Places many fleets at once. Row r of every board is packed side by side into one
+    # int, one fixed-width lane per board, so finding the free starts for the k-th ship
+    # of every fleet is a single pass of shifts/ands over those ints. Each lane keeps a
+    # spare always-taken bit past the last column and the rows below the grid count as
+    # taken, so ships can neither wrap into the next board nor run off the grid. Only the
+    # uniform pick stays per board, with the same distribution as PlacementEngine.
+    def __init__(self, grid_size: int, rng: Optional[random.Random] = None):
+        typecode = BatchPlacementEngine.lane_typecode(grid_size)
+        if typecode is None:
+            raise ValueError(f"Grid size {grid_size} is too wide for batched placement")
+        self.grid_size = grid_size
+        self.rng = rng or random
+        self.typecode = typecode
+        self.full_row = (1 << grid_size) - 1
+        # lanes_at_least[n][d]: full lane for ship dimensions d >= n, empty otherwise
+        self.lanes_at_least = [
+            [0] * minimum + [self.full_row] * (grid_size + 1 - minimum)
+            for minimum in range(grid_size + 1)
+        ]
+
+    @staticmethod
+    def lane_typecode(grid_size: int) -> Optional[str]:
+        for bits, typecode in _LANE_TYPECODES:
+            if grid_size < bits and array(typecode).itemsize * 8 == bits:
+                return typecode
+        return None
+
+    def _pack(self, lanes) -> int:
+        return int.from_bytes(array(self.typecode, lanes).tobytes(), sys.byteorder)
+
+    def _unpack(self, value: int, count: int) -> array:
+        lanes = array(self.typecode)
+        lanes.frombytes(value.to_bytes(count * lanes.itemsize, sys.byteorder))
+        return lanes
+
+    def place_fleets(
+        self,
+        fleets: List[List[Dict]],
+        rngs: Optional[List[random.Random]] = None
+    ) -> List[Optional[List[Tuple[int, int, int, int]]]]:
+        # Per fleet, one (top, left, height, width) per ship in fleet order; None where it did not fit.
+        # A fleet drawing from its own rng lands exactly where PlacementEngine with that rng puts it.
+        size = self.grid_size
+        count = len(fleets)
+        rngs = rngs or [self.rng] * count
+        orders = [
+            sorted(range(len(ships)), key=lambda i, s=ships: s[i]["size"][0] * s[i]["size"][1], reverse=True)
+            for ships in fleets
+        ]
+        placements: List[Optional[List]] = [[None] * len(ships) for ships in fleets]
+        occupancy = [array(self.typecode, [0] * count) for _ in range(size)]
+        all_lanes = self._pack([self.full_row] * count)
+        below_grid = [all_lanes] * size
+
+        for step in range(max(map(len, orders), default=0)):
+            active = [b for b in range(count) if placements[b] is not None and step < len(orders[b])]
+            if not active:
+                break
+            shapes = [(0, 0)] * count
+            for b in active:
+                shapes[b] = fleets[b][orders[b][step]]["size"]
+            rows = [int.from_bytes(row.tobytes(), sys.byteorder) for row in occupancy] + below_grid
+
+            # starts[orientation * size + top] holds per-board masks of free left columns
+            starts = []
+            for swapped in (False, True):
+                heights = [0] * count
+                widths = [0] * count
+                for b in active:
+                    height, width = shapes[b]
+                    if swapped:
+                        if height == width:
+                            continue
+                        height, width = width, height
+                    if height <= size and width <= size:
+                        heights[b], widths[b] = height, width
+                starts.extend(self._free_starts(rows, heights, widths, all_lanes))
+
+            counts = [list(map(int.bit_count, lanes)) for lanes in starts]
+            totals = list(map(sum, zip(*counts)))
+            for b in active:
+                if not totals[b]:
+                    placements[b] = None
+                    continue
+                pick = rngs[b].randrange(totals[b])
+                for index, lane_counts in enumerate(counts):
+                    if pick < lane_counts[b]:
+                        break
+                    pick -= lane_counts[b]
+                mask = starts[index][b]
+                for _ in range(pick):
+                    mask &= mask - 1
+                left = (mask & -mask).bit_length() - 1
+                swapped, top = divmod(index, size)
+                height, width = shapes[b][::-1] if swapped else shapes[b]
+                row_bits = ((1 << width) - 1) << left
+                for row in range(top, top + height):
+                    occupancy[row][b] |= row_bits
+                placements[b][orders[b][step]] = (top, left, height, width)
+        return placements
+
+    def _free_starts(self, rows: List[int], heights: List[int], widths: List[int], all_lanes: int) -> List[array]:
+        size = self.grid_size
+        count = len(heights)
+        max_height = max(heights)
+        max_width = max(widths)
+        if not max_height:
+            return [array(self.typecode, bytes(count * array(self.typecode).itemsize))] * size
+
+        # needs_row[i]: lanes whose ship covers window row i; needs_shift[s]: ship wider than s
+        needs_row = [self._pack(map(self.lanes_at_least[i + 1].__getitem__, heights)) for i in range(max_height)]
+        needs_shift = [self._pack(map(self.lanes_at_least[s + 1].__getitem__, widths)) for s in range(max_width)]
+
+        starts = []
+        for top in range(size):
+            taken = 0
+            for i in range(max_height):
+                taken |= rows[top + i] & needs_row[i]
+            free = ~taken & all_lanes
+            mask = free & needs_row[0]
+            for shift in range(1, max_width):
+                mask &= (free >> shift) | ~needs_shift[shift]
+            starts.append(self._unpack(mask, count))
+        return starts
@@ -0,0 +1,78 @@
+# services/player_cache.py
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+from models.player import Player
+from services.database import Database
+
+PLAYER_CACHE_SIZE = 10000
+PLAYER_CACHE_TTL = 30.0  # seconds
+
+
+class PlayerCache:
+    # Read-through cache of player documents. Whatever writes a player (create here, ScoreFlusher,
+    # PresenceTracker) invalidates its entry once the write is done.
+    entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()  # player_id -> (expires_at, player), LRU first
+    max_size: int = PLAYER_CACHE_SIZE
+    ttl: float = PLAYER_CACHE_TTL
+    counters: Dict[str, int] = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0, "coalesced": 0}
+    _loading: Dict[str, asyncio.Future] = {}
+
+    @classmethod
+    def configure(cls, max_size: int = PLAYER_CACHE_SIZE, ttl: float = PLAYER_CACHE_TTL):
+        cls.max_size = max_size
+        cls.ttl = ttl
+        cls.entries.clear()
+
+    @classmethod
+    async def get(cls, player_id: str) -> Optional[Dict]:
+        # Returns a copy, so callers can modify it freely
+        entry = cls.entries.get(player_id)
+        if entry is not None:
+            expires_at, player = entry
+            if expires_at > time.monotonic():
+                cls.counters["hits"] += 1
+                cls.entries.move_to_end(player_id)
+                return dict(player)
+            cls.counters["expired"] += 1
+            del cls.entries[player_id]
+
+        # Concurrent misses for one player share one query
+        loading = cls._loading.get(player_id)
+        if loading is None:
+            cls.counters["misses"] += 1
+            loading = cls._loading[player_id] = asyncio.ensure_future(cls._load(player_id))
+            loading.add_done_callback(lambda done: cls._loading.pop(player_id, None) if cls._loading.get(player_id) is done else None)
+        else:
+            cls.counters["coalesced"] += 1
+        player = await asyncio.shield(loading)
+        return dict(player) if player is not None else None
+
+    @classmethod
+    async def create(cls, player: Player) -> Player:
+        created = await Database.create_player(player)
+        cls.invalidate(str(player.id))
+        return created
+
+    @classmethod
+    def invalidate(cls, player_id: str):
+        cls.counters["invalidations"] += 1
+        cls.entries.pop(player_id, None)
+        # A read already in flight may return the old document; it is not cached
+        cls._loading.pop(player_id, None)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {"size": len(cls.entries), "max_size": cls.max_size, "ttl": cls.ttl, **cls.counters}
+
+    @classmethod
+    async def _load(cls, player_id: str) -> Optional[Dict]:
+        player = await Database.get_player(player_id)
+        if player is not None and cls._loading.get(player_id) is asyncio.current_task():
+            cls.entries[player_id] = (time.monotonic() + cls.ttl, player)
+            cls.entries.move_to_end(player_id)
+            while len(cls.entries) > cls.max_size:
+                cls.entries.popitem(last=False)
+                cls.counters["evictions"] += 1
+        return player
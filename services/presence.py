@@ -0,0 +1,158 @@
+# services/presence.py
+import asyncio
+import logging
+import time
+from bisect import bisect_right, insort
+from typing import Dict, List, Optional, Set
+from bson import ObjectId
+from services.database import Database
+from services.player_cache import PlayerCache
+
+logger = logging.getLogger(__name__)
+
+PRESENCE_GRACE = 10.0  # seconds a player stays online after their last socket closes
+PRESENCE_FLUSH_INTERVAL = 2.0  # seconds between bulk writes of is_online changes
+ONLINE_PAGE_LIMIT = 100
+
+
+class PresenceTracker:
+    # Who is online is decided here; Mongo's is_online only follows, in batches.
+    # A reconnect within the grace period writes nothing at all.
+    connections: Dict[str, int] = {}  # player_id -> open sockets
+    online: List[str] = []  # online player ids, sorted, for cursor pagination
+    offline_at: Dict[str, float] = {}  # player_id -> when the grace period runs out
+    persisted: Set[str] = set()  # players last written to Mongo as online
+    dirty: Set[str] = set()  # players whose presence changed since the last flush
+    grace: float = PRESENCE_GRACE
+    flush_interval: float = PRESENCE_FLUSH_INTERVAL
+    counters: Dict[str, int] = {
+        "connects": 0,
+        "disconnects": 0,
+        "reconnects_in_grace": 0,
+        "flushes": 0,
+        "players_written": 0,
+        "flush_errors": 0,
+        "invalid_ids_dropped": 0,
+    }
+    _flush_lock: Optional[asyncio.Lock] = None
+    _flusher: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, grace: float = PRESENCE_GRACE, flush_interval: float = PRESENCE_FLUSH_INTERVAL):
+        cls.grace = grace
+        cls.flush_interval = flush_interval
+        cls._flush_lock = asyncio.Lock()
+        cls._flusher = asyncio.create_task(cls._flush_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls._flusher:
+            cls._flusher.cancel()
+            try:
+                await cls._flusher
+            except asyncio.CancelledError:
+                pass
+            cls._flusher = None
+        # Nobody stays online once this process is gone
+        cls.connections.clear()
+        cls.offline_at = {player_id: 0.0 for player_id in cls.online}
+        await cls.flush()
+
+    @classmethod
+    def connect(cls, player_id: str):
+        cls.counters["connects"] += 1
+        cls.connections[player_id] = cls.connections.get(player_id, 0) + 1
+        if cls.offline_at.pop(player_id, None) is not None:
+            cls.counters["reconnects_in_grace"] += 1
+        elif cls.connections[player_id] == 1 and not cls.is_online(player_id):
+            insort(cls.online, player_id)
+            cls.dirty.add(player_id)
+
+    @classmethod
+    def disconnect(cls, player_id: str):
+        cls.counters["disconnects"] += 1
+        remaining = cls.connections.get(player_id, 0) - 1
+        if remaining > 0:
+            cls.connections[player_id] = remaining
+            return
+        cls.connections.pop(player_id, None)
+        if cls.is_online(player_id):
+            cls.offline_at[player_id] = time.monotonic() + cls.grace
+
+    @classmethod
+    def is_online(cls, player_id: str) -> bool:
+        index = bisect_right(cls.online, player_id) - 1
+        return index >= 0 and cls.online[index] == player_id
+
+    @classmethod
+    def count(cls) -> int:
+        return len(cls.online)
+
+    @classmethod
+    def page(cls, cursor: Optional[str] = None, limit: int = ONLINE_PAGE_LIMIT) -> Dict:
+        # Players after `cursor` in id order; pass next_cursor back to get the following page
+        start = bisect_right(cls.online, cursor) if cursor else 0
+        players = cls.online[start:start + limit]
+        more = start + limit < len(cls.online)
+        return {
+            "players": players,
+            "next_cursor": players[-1] if more and players else None,
+            "count": len(cls.online),
+        }
+
+    @classmethod
+    async def flush(cls):
+        async with cls._flush_lock or asyncio.Lock():
+            now = time.monotonic()
+            for player_id in [p_id for p_id, deadline in cls.offline_at.items() if deadline <= now]:
+                del cls.offline_at[player_id]
+                del cls.online[bisect_right(cls.online, player_id) - 1]
+                cls.dirty.add(player_id)
+
+            # A player who went offline and came back (or the reverse) since the last flush needs no write
+            changes = {
+                player_id: is_online for player_id, is_online in
+                ((player_id, cls.is_online(player_id)) for player_id in cls.dirty)
+                if is_online != (player_id in cls.persisted)
+            }
+            cls.dirty = set()
+            # An id that is not an ObjectId can never be written; retrying it would fail every batch
+            invalid = [player_id for player_id in changes if not ObjectId.is_valid(player_id)]
+            for player_id in invalid:
+                del changes[player_id]
+                cls.persisted.discard(player_id)
+            if invalid:
+                cls.counters["invalid_ids_dropped"] += len(invalid)
+                logger.warning("Presence flush dropped %d invalid player ids", len(invalid))
+            if not changes:
+                return
+            try:
+                await Database.bulk_set_players_online(changes)
+            except Exception:
+                cls.counters["flush_errors"] += 1
+                cls.dirty.update(changes)
+                logger.exception("Presence flush of %d players failed", len(changes))
+                return
+            for player_id, is_online in changes.items():
+                if is_online:
+                    cls.persisted.add(player_id)
+                else:
+                    cls.persisted.discard(player_id)
+                PlayerCache.invalidate(player_id)
+            cls.counters["flushes"] += 1
+            cls.counters["players_written"] += len(changes)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {
+            "online": len(cls.online),
+            "connected": len(cls.connections),
+            "in_grace": len(cls.offline_at),
+            **cls.counters,
+        }
+
+    @classmethod
+    async def _flush_loop(cls):
+        while True:
+            await asyncio.sleep(cls.flush_interval)
+            await cls.flush()
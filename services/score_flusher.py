@@ -0,0 +1,89 @@
+# services/score_flusher.py
+import asyncio
+import logging
+from typing import Dict, Optional
+from services.database import Database
+from services.player_cache import PlayerCache
+
+logger = logging.getLogger(__name__)
+
+SCORE_FLUSH_INTERVAL = 1.0  # seconds between bulk writes of pending increments
+
+
+class ScoreFlusher:
+    # Player counters (score, wins, losses, games_played) are only ever changed with $inc;
+    # increments pile up here and go out in one bulk write per interval
+    pending: Dict[str, Dict[str, int]] = {}  # player_id -> field -> amount
+    flush_interval: float = SCORE_FLUSH_INTERVAL
+    counters: Dict[str, int] = {"increments": 0, "flushes": 0, "players_written": 0, "flush_errors": 0}
+    _flush_lock: Optional[asyncio.Lock] = None
+    _flusher: Optional[asyncio.Task] = None
+
+    @classmethod
+    async def start(cls, flush_interval: float = SCORE_FLUSH_INTERVAL):
+        cls.flush_interval = flush_interval
+        cls._flush_lock = asyncio.Lock()
+        cls._flusher = asyncio.create_task(cls._flush_loop())
+
+    @classmethod
+    async def stop(cls):
+        if cls._flusher:
+            cls._flusher.cancel()
+            try:
+                await cls._flusher
+            except asyncio.CancelledError:
+                pass
+            cls._flusher = None
+        await cls.flush()
+
+    @classmethod
+    def add(cls, player_id: str, **amounts: int):
+        fields = cls.pending.setdefault(player_id, {})
+        for field, amount in amounts.items():
+            if amount:
+                fields[field] = fields.get(field, 0) + amount
+        cls.counters["increments"] += 1
+
+    @classmethod
+    def record_game(cls, winner: Optional[str], players, score: int = 0):
+        # winner is a player id, 'draw' or None; bots are not passed in
+        for player_id in players:
+            if player_id == winner:
+                cls.add(player_id, score=score, wins=1, games_played=1)
+            elif winner == 'draw':
+                cls.add(player_id, games_played=1)
+            else:
+                cls.add(player_id, losses=1, games_played=1)
+
+    @classmethod
+    async def flush(cls):
+        async with cls._flush_lock or asyncio.Lock():
+            batch = {player_id: fields for player_id, fields in cls.pending.items() if fields}
+            cls.pending = {}
+            if not batch:
+                return
+            try:
+                await Database.bulk_increment_players(batch)
+            except Exception:
+                cls.counters["flush_errors"] += 1
+                # Increments are additive, so unsent ones fold back in with anything added since
+                for player_id, fields in batch.items():
+                    pending = cls.pending.setdefault(player_id, {})
+                    for field, amount in fields.items():
+                        pending[field] = pending.get(field, 0) + amount
+                logger.exception("Score flush of %d players failed", len(batch))
+                return
+            for player_id in batch:
+                PlayerCache.invalidate(player_id)
+            cls.counters["flushes"] += 1
+            cls.counters["players_written"] += len(batch)
+
+    @classmethod
+    def stats(cls) -> Dict:
+        return {"pending_players": len(cls.pending), **cls.counters}
+
+    @classmethod
+    async def _flush_loop(cls):
+        while True:
+            await asyncio.sleep(cls.flush_interval)
+            await cls.flush()
@@ -0,0 +1,103 @@
+# services/storage/base.py
+from abc import ABC, abstractmethod
+from bson import ObjectId
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from models.player import Player
+from models.game import Game
+
+ArchiveTransform = Callable[[Game], Awaitable[Game]]  # game -> the document to archive in its place
+
+
+class StorageBackend(ABC):
+    # Everything the app persists goes through one of these; Database forwards to the backend
+    # chosen by URL scheme at startup. Documents keep Mongo's shapes and update semantics in
+    # every backend: games are keyed by an ObjectId `_id`, players by an ObjectId `id` field,
+    # and updates are Mongo update documents ({"$set": ..., "$inc": ...}) with dotted paths.
+
+    @abstractmethod
+    async def connect(self): ...
+
+    @abstractmethod
+    async def close(self): ...
+
+    @abstractmethod
+    async def ensure_indexes(self): ...
+
+    @abstractmethod
+    async def drop_all(self):
+        # Empties every collection; only for tests and benchmarks
+        ...
+
+    # Players
+
+    @abstractmethod
+    async def get_player(self, player_id: str) -> Optional[Dict]: ...
+
+    @abstractmethod
+    async def create_player(self, player: Player) -> Player: ...
+
+    @abstractmethod
+    async def update_player(self, player: Dict) -> bool: ...
+
+    @abstractmethod
+    async def update_player_fields(self, player_id: str, fields: Dict) -> bool: ...
+
+    @abstractmethod
+    async def bulk_increment_players(self, increments: Dict[str, Dict[str, int]]) -> int: ...
+
+    @abstractmethod
+    async def bulk_set_players_online(self, changes: Dict[str, bool]) -> int: ...
+
+    # Games
+
+    @abstractmethod
+    async def get_games(self, grid_id: str) -> List[Game]: ...
+
+    @abstractmethod
+    async def get_game(self, game_id: str) -> Optional[Game]:
+        # Looks in the archive too
+        ...
+
+    @abstractmethod
+    async def archive_finished_games(self, finished_before: datetime, batch_size: int,
+                                     transform: Optional[ArchiveTransform] = None) -> int: ...
+
+    @abstractmethod
+    async def create_game(self, game: Game) -> Game:
+        # Sets game["_id"] in place, like insert_one
+        ...
+
+    @abstractmethod
+    async def update_game(self, game: Game) -> bool: ...
+
+    @abstractmethod
+    async def update_game_fields(self, game_id, update: Dict) -> bool: ...
+
+    @abstractmethod
+    async def bulk_update_games(self, updates: List[Tuple[ObjectId, Dict]]) -> int: ...
+
+    @abstractmethod
+    async def update_games_versioned(self, updates: List[Tuple[ObjectId, int, Dict]]) -> List[ObjectId]:
+        # (game_id, version, update): each update is applied only while the stored game is still at
+        # that version (a missing version counts as 0), and bumps it by one. Returns the ids not written.
+        ...
+
+    # Game event log: append-only moves keyed by (game_id, seq), plus full-game snapshots
+    # taken every so many events. Inserting a (game_id, seq) that exists already is a no-op.
+
+    @abstractmethod
+    async def append_game_events(self, events: List[Dict]) -> int: ...
+
+    @abstractmethod
+    async def get_game_events(self, game_id: str, after_seq: int = 0, upto_seq: Optional[int] = None) -> List[Dict]:
+        # Events with after_seq < seq <= upto_seq, in order
+        ...
+
+    @abstractmethod
+    async def save_game_snapshots(self, snapshots: List[Dict]) -> int: ...
+
+    @abstractmethod
+    async def get_game_snapshot(self, game_id: str, upto_seq: Optional[int] = None) -> Optional[Dict]:
+        # The latest snapshot at or before upto_seq
+        ...
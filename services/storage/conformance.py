@@ -0,0 +1,265 @@
+# services/storage/conformance.py
+# Behaviour every StorageBackend must share. Each check starts from empty collections.
+#
+# Usage: python -m services.storage.conformance memory:// mongodb://localhost:27017/battleship_conformance
+# Point Mongo at a throwaway database: the checks drop its collections.
+import asyncio
+import sys
+import traceback
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from models.game import GameState
+from models.player import Player
+from services.database import Database
+from services.storage.base import StorageBackend
+
+Check = Callable[[StorageBackend], Awaitable[None]]
+CHECKS: List[Check] = []
+
+
+def check(func: Check) -> Check:
+    CHECKS.append(func)
+    return func
+
+
+def _now() -> datetime:
+    # Mongo keeps milliseconds only
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+
+def _game(grid_id: str = "10", state: GameState = GameState.IN_PROGRESS, **fields) -> Dict:
+    game = {
+        "grid_id": grid_id,
+        "players": ["a", "b"],
+        "boards": {
+            "a": {"cells": [["sea", "P10"], ["Q20", "sea"]], "missile_count": 5, "remaining_health": 3,
+                  "ships": [{"id": 1, "type": "P", "size": 1, "remaining": 1}]},
+            "b": {"cells": [["sea", "sea"], ["sea", "P10"]], "missile_count": 5, "remaining_health": 1,
+                  "ships": [{"id": 1, "type": "P", "size": 1, "remaining": 1}]},
+        },
+        "state": state,
+        "current_turn": "a",
+        "winner": None,
+        "score": None,
+    }
+    game.update(fields)
+    return game
+
+
+@check
+async def player_roundtrip(backend: StorageBackend):
+    player = Player(name="ada")
+    assert await backend.create_player(player) is player
+    stored = await backend.get_player(str(player.id))
+    assert stored["name"] == "ada" and stored["score"] == 0 and stored["id"] == player.id
+    assert await backend.get_player(str(ObjectId())) is None
+    try:
+        await backend.create_player(Player(name="ada"))
+    except DuplicateKeyError:
+        pass
+    else:
+        raise AssertionError("duplicate player name was accepted")
+
+
+@check
+async def player_updates(backend: StorageBackend):
+    player = Player(name="grace")
+    await backend.create_player(player)
+    player_id = str(player.id)
+
+    assert await backend.update_player_fields(player_id, {"is_online": True})
+    assert not await backend.update_player_fields(player_id, {"is_online": True}), "unchanged update counted"
+    assert not await backend.update_player_fields(str(ObjectId()), {"is_online": True})
+
+    stored = await backend.get_player(player_id)
+    stored["score"] = 7
+    assert await backend.update_player(stored)
+    assert (await backend.get_player(player_id))["score"] == 7
+
+    written = await backend.bulk_increment_players({
+        player_id: {"score": 3, "wins": 1, "games_played": 1},
+        str(ObjectId()): {"score": 1},
+    })
+    assert written == 1, written
+    stored = await backend.get_player(player_id)
+    assert (stored["score"], stored["wins"], stored["games_played"]) == (10, 1, 1), stored
+
+    assert await backend.bulk_set_players_online({player_id: False}) == 1
+    assert (await backend.get_player(player_id))["is_online"] is False
+
+
+@check
+async def game_create_and_isolation(backend: StorageBackend):
+    game = _game()
+    assert await backend.create_game(game) is game
+    assert isinstance(game["_id"], ObjectId), "create_game must set _id in place"
+
+    stored = await backend.get_game(str(game["_id"]))
+    assert stored["boards"] == game["boards"] and stored["state"] == GameState.IN_PROGRESS
+    stored["boards"]["a"]["cells"][0][0] = "sea1"
+    game["boards"]["b"]["cells"][0][0] = "sea1"
+    again = await backend.get_game(str(game["_id"]))
+    assert again["boards"]["a"]["cells"][0][0] == "sea", "returned documents must be copies"
+    assert again["boards"]["b"]["cells"][0][0] == "sea", "stored documents must be copies"
+    assert await backend.get_game(str(ObjectId())) is None
+
+    assert [g["_id"] for g in await backend.get_games("10")] == [game["_id"]]
+    assert await backend.get_games("12") == []
+
+
+@check
+async def game_field_updates(backend: StorageBackend):
+    game = _game()
+    await backend.create_game(game)
+    game_id = game["_id"]
+
+    assert await backend.update_game_fields(str(game_id), {
+        "$set": {"boards.b.cells.1.1": "P01", "current_turn": "b"},
+        "$inc": {"boards.b.remaining_health": -1, "boards.b.ships.0.remaining": -1, "boards.a.missile_count": -1},
+    })
+    stored = await backend.get_game(str(game_id))
+    assert stored["boards"]["b"]["cells"] == [["sea", "sea"], ["sea", "P01"]], stored["boards"]["b"]["cells"]
+    assert stored["boards"]["b"]["remaining_health"] == 0
+    assert stored["boards"]["b"]["ships"][0]["remaining"] == 0
+    assert stored["boards"]["a"]["missile_count"] == 4
+    assert stored["current_turn"] == "b"
+
+    other = _game()
+    await backend.create_game(other)
+    written = await backend.bulk_update_games([
+        (game_id, {"$set": {"state": GameState.FINISHED.value, "winner": "a"}}),
+        (other["_id"], {"$inc": {"boards.a.missile_count": -2}}),
+        (ObjectId(), {"$set": {"state": GameState.FINISHED.value}}),
+    ])
+    assert written == 2, written
+    assert (await backend.get_game(str(game_id)))["winner"] == "a"
+    assert (await backend.get_game(str(other["_id"])))["boards"]["a"]["missile_count"] == 3
+
+    stored = await backend.get_game(str(other["_id"]))
+    stored["score"] = 12
+    assert await backend.update_game(stored)
+    assert not await backend.update_game(stored), "unchanged update counted"
+    assert (await backend.get_game(str(other["_id"])))["score"] == 12
+
+
+@check
+async def versioned_game_updates(backend: StorageBackend):
+    legacy = _game()
+    versioned = _game(version=3)
+    await backend.create_game(legacy)
+    await backend.create_game(versioned)
+
+    conflicts = await backend.update_games_versioned([
+        (legacy["_id"], 0, {"$set": {"current_turn": "b"}}),  # no version field counts as 0
+        (versioned["_id"], 2, {"$set": {"current_turn": "b"}}),
+        (ObjectId(), 0, {"$set": {"current_turn": "b"}}),
+    ])
+    assert len(conflicts) == 2 and versioned["_id"] in conflicts, conflicts
+    stored = await backend.get_game(str(legacy["_id"]))
+    assert stored["version"] == 1 and stored["current_turn"] == "b", stored
+    stored = await backend.get_game(str(versioned["_id"]))
+    assert stored["version"] == 3 and stored["current_turn"] == "a", "a stale version was written"
+
+    assert await backend.update_games_versioned([
+        (versioned["_id"], 3, {"$inc": {"boards.a.missile_count": -1}}),
+    ]) == []
+    stored = await backend.get_game(str(versioned["_id"]))
+    assert stored["version"] == 4 and stored["boards"]["a"]["missile_count"] == 4, stored
+
+
+@check
+async def archive_finished_games(backend: StorageBackend):
+    now = _now()
+    old = _game(state=GameState.FINISHED, finished_at=now - timedelta(hours=2))
+    recent = _game(state=GameState.FINISHED, finished_at=now)
+    live = _game()
+    legacy = _game(state=GameState.FINISHED, _id=ObjectId.from_datetime(now - timedelta(days=1)))
+    for game in (old, recent, live, legacy):
+        await backend.create_game(game)
+
+    cutoff = now - timedelta(hours=1)
+    assert await backend.archive_finished_games(cutoff, 1) == 1, "batch size not respected"
+    assert await backend.archive_finished_games(cutoff, 10) == 1
+    assert await backend.archive_finished_games(cutoff, 10) == 0
+
+    hot = {game["_id"] for game in await backend.get_games("10")}
+    assert hot == {recent["_id"], live["_id"]}, hot
+    for game in (old, legacy):
+        archived = await backend.get_game(str(game["_id"]))
+        assert archived is not None and archived["state"] == GameState.FINISHED, "archived game not found by id"
+
+    # The transform decides what is archived in the game's place
+    transformed = _game(state=GameState.FINISHED, finished_at=now - timedelta(hours=2))
+    await backend.create_game(transformed)
+
+    async def strip(game):
+        return {**game, "boards": {}}
+
+    assert await backend.archive_finished_games(cutoff, 10, strip) == 1
+    archived = await backend.get_game(str(transformed["_id"]))
+    assert archived is not None and archived["boards"] == {}, "archive transform not applied"
+
+
+@check
+async def game_event_log(backend: StorageBackend):
+    game_id = ObjectId()
+    now = _now()
+    events = [{"game_id": game_id, "seq": seq, "player_id": "a", "position": [0, seq], "at": now}
+              for seq in range(1, 6)]
+    assert await backend.append_game_events(events[:3]) == 3
+    # A retried batch only adds what is missing
+    assert await backend.append_game_events(events) == 2
+    await backend.append_game_events([{"game_id": ObjectId(), "seq": 1, "player_id": "b", "position": "A1", "at": now}])
+
+    logged = await backend.get_game_events(str(game_id))
+    assert [event["seq"] for event in logged] == [1, 2, 3, 4, 5]
+    assert logged[0]["position"] == [0, 1] and logged[0]["at"] == now
+    assert [event["seq"] for event in await backend.get_game_events(str(game_id), 2, 4)] == [3, 4]
+
+    assert await backend.get_game_snapshot(str(game_id)) is None
+    snapshots = [{"game_id": game_id, "seq": seq, "at": now, "game": _game(event_seq=seq)} for seq in (0, 4)]
+    assert await backend.save_game_snapshots(snapshots) == 2
+    assert await backend.save_game_snapshots(snapshots[:1]) == 0
+    assert (await backend.get_game_snapshot(str(game_id)))["seq"] == 4
+    snapshot = await backend.get_game_snapshot(str(game_id), 3)
+    assert snapshot["seq"] == 0 and snapshot["game"]["boards"] == _game()["boards"]
+
+
+async def run(url: str) -> Dict[str, Optional[str]]:
+    # check name -> None when it passed, else the failure
+    backend = Database.open_backend(url)
+    await backend.connect()
+    results = {}
+    try:
+        for func in CHECKS:
+            # Dropping the collections drops their indexes too; checks rely on the unique ones
+            await backend.drop_all()
+            await backend.ensure_indexes()
+            try:
+                await func(backend)
+                results[func.__name__] = None
+            except Exception:
+                results[func.__name__] = traceback.format_exc(limit=2)
+        await backend.drop_all()
+    finally:
+        await backend.close()
+    return results
+
+
+def main(urls: List[str]) -> int:
+    failed = 0
+    for url in urls:
+        print(url)
+        for name, failure in asyncio.run(run(url)).items():
+            print(f"  {'ok' if failure is None else 'FAIL'}  {name}")
+            if failure is not None:
+                failed += 1
+                print("    " + failure.replace("\n", "\n    "))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:] or ["memory://"]))
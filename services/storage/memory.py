@@ -0,0 +1,209 @@
+# services/storage/memory.py
+from bson import ObjectId
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from typing import Any, Dict, List, Optional, Tuple
+from models.player import Player
+from models.game import Game, GameState
+from services.storage.base import ArchiveTransform, StorageBackend
+
+
+def _copy(value: Any) -> Any:
+    # Documents are nested dicts and lists of immutable leaves; much cheaper than copy.deepcopy
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    return value
+
+
+def _resolve(doc: Dict, path: str, create: bool) -> Tuple[Any, Any]:
+    # (container, key) for a dotted path; list positions are numeric path parts
+    parts = path.split(".")
+    target = doc
+    for part in parts[:-1]:
+        if isinstance(target, list):
+            target = target[int(part)]
+        elif target.get(part) is not None:
+            target = target[part]
+        elif create:
+            target[part] = {}
+            target = target[part]
+        else:
+            return None, None
+    key = parts[-1]
+    if isinstance(target, list):
+        key = int(key)
+        if create:
+            target.extend([None] * (key + 1 - len(target)))
+    return target, key
+
+
+_MISSING = object()
+
+
+def apply_update(doc: Dict, update: Dict) -> bool:
+    # Applies a Mongo update document in place; True when anything changed
+    changed = False
+    for operator, fields in update.items():
+        if operator not in ("$set", "$inc"):
+            raise ValueError(f"Unsupported update operator {operator}")
+        for path, value in fields.items():
+            if path == "_id":
+                if value != doc.get("_id"):
+                    raise ValueError("_id is immutable")
+                continue
+            target, key = _resolve(doc, path, create=True)
+            if operator == "$set":
+                new = _copy(value)
+            else:
+                current = target[key] if isinstance(target, list) else target.get(key)
+                new = (current or 0) + value
+            old = target[key] if isinstance(target, list) else target.get(key, _MISSING)
+            if old is _MISSING or old != new:
+                target[key] = new
+                changed = True
+    return changed
+
+
+class MemoryBackend(StorageBackend):
+    # Process-local storage with the Mongo backend's semantics. Documents are copied on the way
+    # in and out, and no method awaits halfway through, so every call is atomic.
+    def __init__(self, url: str = "memory://"):
+        self.url = url
+        self.players: Dict[ObjectId, Dict] = {}  # keyed by the player's `id` field
+        self.games: Dict[ObjectId, Dict] = {}
+        self.archive: Dict[ObjectId, Dict] = {}
+        self.game_events: Dict[ObjectId, Dict[int, Dict]] = {}  # game_id -> seq -> event
+        self.game_snapshots: Dict[ObjectId, Dict[int, Dict]] = {}
+
+    async def connect(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def ensure_indexes(self):
+        pass
+
+    async def drop_all(self):
+        self.players.clear()
+        self.games.clear()
+        self.archive.clear()
+        self.game_events.clear()
+        self.game_snapshots.clear()
+
+    async def get_player(self, player_id: str) -> Optional[Player]:
+        player = self.players.get(ObjectId(player_id))
+        return _copy(player) if player is not None else None
+
+    async def create_player(self, player: Player) -> Player:
+        doc = player.dict()
+        if any(existing["name"] == doc["name"] for existing in self.players.values()):
+            raise DuplicateKeyError(f"Player name {doc['name']!r} is taken")
+        doc["_id"] = ObjectId()
+        self.players[doc["id"]] = doc
+        return player
+
+    async def update_player(self, player: Player) -> bool:
+        return self._update_player(player['id'], {"$set": player})
+
+    async def update_player_fields(self, player_id: str, fields: Dict) -> bool:
+        return self._update_player(player_id, {"$set": fields})
+
+    async def bulk_increment_players(self, increments: Dict[str, Dict[str, int]]) -> int:
+        return sum(self._update_player(player_id, {"$inc": fields}) for player_id, fields in increments.items())
+
+    async def bulk_set_players_online(self, changes: Dict[str, bool]) -> int:
+        return sum(
+            self._update_player(player_id, {"$set": {"is_online": is_online}})
+            for player_id, is_online in changes.items()
+        )
+
+    async def get_games(self, grid_id: str) -> List[Game]:
+        return [_copy(game) for game in self.games.values() if game["grid_id"] == grid_id]
+
+    async def get_game(self, game_id: str) -> Optional[Game]:
+        game_id = ObjectId(game_id)
+        game = self.games.get(game_id) or self.archive.get(game_id)
+        return _copy(game) if game is not None else None
+
+    async def archive_finished_games(self, finished_before: datetime, batch_size: int,
+                                     transform: Optional[ArchiveTransform] = None) -> int:
+        oldest_id = ObjectId.from_datetime(finished_before)
+        due = sorted(
+            game_id for game_id, game in self.games.items()
+            if game["state"] == GameState.FINISHED and (
+                game["finished_at"] < finished_before if isinstance(game.get("finished_at"), datetime)
+                else "finished_at" not in game and game_id < oldest_id
+            )
+        )[:batch_size]
+        for game_id in due:
+            game = self.games[game_id]
+            self.archive[game_id] = _copy(await transform(_copy(game))) if transform else game
+            del self.games[game_id]
+        return len(due)
+
+    async def create_game(self, game: Game) -> Game:
+        game.setdefault("_id", ObjectId())
+        if game["_id"] in self.games:
+            raise DuplicateKeyError(f"Duplicate game id {game['_id']}")
+        self.games[game["_id"]] = _copy(game)
+        return game
+
+    async def update_game(self, game: Game) -> bool:
+        return self._update_game(game["_id"], {"$set": game})
+
+    async def update_game_fields(self, game_id, update: Dict) -> bool:
+        return self._update_game(ObjectId(game_id), update)
+
+    async def bulk_update_games(self, updates: List[Tuple[ObjectId, Dict]]) -> int:
+        return sum(self._update_game(game_id, update) for game_id, update in updates)
+
+    async def update_games_versioned(self, updates: List[Tuple[ObjectId, int, Dict]]) -> List[ObjectId]:
+        conflicts = []
+        for game_id, version, update in updates:
+            game = self.games.get(game_id)
+            if game is None or game.get("version", 0) != version:
+                conflicts.append(game_id)
+                continue
+            apply_update(game, update)
+            game["version"] = version + 1
+        return conflicts
+
+    async def append_game_events(self, events: List[Dict]) -> int:
+        return self._insert_new(self.game_events, events)
+
+    async def get_game_events(self, game_id: str, after_seq: int = 0, upto_seq: Optional[int] = None) -> List[Dict]:
+        events = self.game_events.get(ObjectId(game_id), {})
+        return [
+            _copy(events[seq]) for seq in sorted(events)
+            if seq > after_seq and (upto_seq is None or seq <= upto_seq)
+        ]
+
+    async def save_game_snapshots(self, snapshots: List[Dict]) -> int:
+        return self._insert_new(self.game_snapshots, snapshots)
+
+    async def get_game_snapshot(self, game_id: str, upto_seq: Optional[int] = None) -> Optional[Dict]:
+        snapshots = self.game_snapshots.get(ObjectId(game_id), {})
+        seqs = [seq for seq in snapshots if upto_seq is None or seq <= upto_seq]
+        return _copy(snapshots[max(seqs)]) if seqs else None
+
+    def _insert_new(self, collection: Dict[ObjectId, Dict[int, Dict]], docs: List[Dict]) -> int:
+        # Like the unique (game_id, seq) index in Mongo: documents already there are skipped
+        inserted = 0
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+            by_seq = collection.setdefault(doc["game_id"], {})
+            if doc["seq"] not in by_seq:
+                by_seq[doc["seq"]] = _copy(doc)
+                inserted += 1
+        return inserted
+
+    def _update_player(self, player_id, update: Dict) -> bool:
+        player = self.players.get(ObjectId(player_id))
+        return player is not None and apply_update(player, update)
+
+    def _update_game(self, game_id: ObjectId, update: Dict) -> bool:
+        game = self.games.get(game_id)
+        return game is not None and apply_update(game, update)
@@ -0,0 +1,206 @@
+# services/storage/mongo.py
+import asyncio
+from bson import ObjectId
+from datetime import datetime
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from typing import Dict, List, Optional, Tuple
+from models.player import Player
+from models.game import Game, GameState
+from services.storage.base import ArchiveTransform, StorageBackend
+
+DEFAULT_DATABASE = "battleship"
+
+
+class MongoBackend(StorageBackend):
+    # mongodb://host:port[/database]; the database defaults to battleship
+    def __init__(self, url: str):
+        self.url = url
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.db = None
+
+    async def connect(self):
+        self.client = AsyncIOMotorClient(self.url)
+        self.db = self.client.get_default_database(DEFAULT_DATABASE)
+
+    async def close(self):
+        if self.client:
+            self.client.close()
+            self.client = None
+
+    async def ensure_indexes(self):
+        await self.db.players.create_index("name", unique=True)
+        # Players are read and updated by their `id` field
+        await self.db.players.create_index("id")
+        # The archiver looks for finished games by age
+        await self.db.games.create_index([("state", 1), ("finished_at", 1)])
+        # One event / snapshot per game and sequence number; retried inserts hit these
+        await self.db.game_events.create_index([("game_id", 1), ("seq", 1)], unique=True)
+        await self.db.game_snapshots.create_index([("game_id", 1), ("seq", 1)], unique=True)
+
+    async def drop_all(self):
+        for name in ("players", "games", "games_archive", "game_events", "game_snapshots"):
+            await self.db[name].drop()
+
+    async def get_player(self, player_id: str) -> Optional[Player]:
+        player = await self.db.players.find_one({"id": ObjectId(player_id)})
+        return player
+
+    async def create_player(self, player: Player) -> Player:
+        await self.db.players.insert_one(player.dict())
+        return player
+
+    async def update_player(self, player: Player) -> bool:
+        # Players are looked up by their `id` field everywhere, see get_player
+        result = await self.db.players.update_one(
+            {"id": ObjectId(player['id'])},
+            {"$set": player}
+        )
+        return result.modified_count > 0
+
+    async def update_player_fields(self, player_id: str, fields: Dict) -> bool:
+        result = await self.db.players.update_one(
+            {"id": ObjectId(player_id)},
+            {"$set": fields}
+        )
+        return result.modified_count > 0
+
+    async def bulk_increment_players(self, increments: Dict[str, Dict[str, int]]) -> int:
+        # player_id -> {field: amount}, applied with $inc in one unordered bulk write
+        if not increments:
+            return 0
+        result = await self.db.players.bulk_write(
+            [UpdateOne({"id": ObjectId(player_id)}, {"$inc": fields}) for player_id, fields in increments.items()],
+            ordered=False
+        )
+        return result.modified_count
+
+    async def bulk_set_players_online(self, changes: Dict[str, bool]) -> int:
+        if not changes:
+            return 0
+        result = await self.db.players.bulk_write(
+            [UpdateOne({"id": ObjectId(player_id)}, {"$set": {"is_online": is_online}})
+             for player_id, is_online in changes.items()],
+            ordered=False
+        )
+        return result.modified_count
+
+    async def get_games(self, grid_id: str) -> List[Game]:
+        cursor = self.db.games.find({"grid_id": grid_id})
+        games = []
+        async for game in cursor:
+            games.append(game)
+        return games
+
+    async def get_game(self, game_id: str) -> List[Game]:
+        game = await self.db.games.find_one({"_id": ObjectId(game_id)})
+        if game is None:
+            # Finished games end up in the archive collection
+            game = await self.db.games_archive.find_one({"_id": ObjectId(game_id)})
+        return game
+
+    async def archive_finished_games(self, finished_before: datetime, batch_size: int,
+                                     transform: Optional[ArchiveTransform] = None) -> int:
+        # Moves one batch of old finished games to games_archive and returns how many moved.
+        # Copying is an idempotent upsert and only copied games are deleted, so an interrupted
+        # batch is simply redone by the next call. `transform` gives the document to archive.
+        games = await self.db.games.find({
+            "state": GameState.FINISHED.value,
+            "$or": [
+                {"finished_at": {"$lt": finished_before}},
+                # Games finished before finished_at was recorded go by their creation time
+                {"finished_at": {"$exists": False}, "_id": {"$lt": ObjectId.from_datetime(finished_before)}},
+            ],
+        }).sort("_id", ASCENDING).limit(batch_size).to_list(batch_size)
+        if not games:
+            return 0
+        archived = [await transform(game) for game in games] if transform else games
+        await self.db.games_archive.bulk_write(
+            [ReplaceOne({"_id": game["_id"]}, game, upsert=True) for game in archived],
+            ordered=False
+        )
+        result = await self.db.games.delete_many({
+            "_id": {"$in": [game["_id"] for game in games]},
+            "state": GameState.FINISHED.value
+        })
+        return result.deleted_count
+    
+    async def create_game(self, game: Game) -> Game:
+        await self.db.games.insert_one(game)
+        return game
+
+    async def update_game(self, game: Game) -> bool:
+        result = await self.db.games.update_one(
+            {"_id": game["_id"]},
+            {"$set": game}
+        )
+        return result.modified_count > 0
+    
+    async def update_game_fields(self, game_id, update: Dict) -> bool:
+        # `update` is a Mongo update document such as {"$set": {...}, "$inc": {...}}
+        result = await self.db.games.update_one({"_id": ObjectId(game_id)}, update)
+        return result.modified_count > 0
+
+    async def bulk_update_games(self, updates: List[Tuple[ObjectId, Dict]]) -> int:
+        if not updates:
+            return 0
+        result = await self.db.games.bulk_write(
+            [UpdateOne({"_id": game_id}, update) for game_id, update in updates],
+            ordered=False
+        )
+        return result.modified_count
+
+    async def update_games_versioned(self, updates: List[Tuple[ObjectId, int, Dict]]) -> List[ObjectId]:
+        # One conditional update_one per game, sent concurrently: a bulk write only reports totals,
+        # which cannot say which of its games had moved on
+        if not updates:
+            return []
+        async def write(game_id: ObjectId, version: int, update: Dict) -> Optional[ObjectId]:
+            result = await self.db.games.update_one(
+                {"_id": game_id, "version": version if version else {"$in": [0, None]}},
+                {**update, "$inc": {**update.get("$inc", {}), "version": 1}}
+            )
+            return None if result.matched_count else game_id
+
+        results = await asyncio.gather(*(write(*update) for update in updates), return_exceptions=True)
+        failed = [result for result in results if isinstance(result, Exception)]
+        if failed and len(failed) == len(results):
+            raise failed[0]
+        # A game whose write errored is reported as not written; the caller checks it against storage
+        return [
+            update[0] for update, result in zip(updates, results)
+            if result is not None
+        ]
+
+    async def append_game_events(self, events: List[Dict]) -> int:
+        return await self._insert_new(self.db.game_events, events)
+
+    async def get_game_events(self, game_id: str, after_seq: int = 0, upto_seq: Optional[int] = None) -> List[Dict]:
+        seq = {"$gt": after_seq}
+        if upto_seq is not None:
+            seq["$lte"] = upto_seq
+        cursor = self.db.game_events.find({"game_id": ObjectId(game_id), "seq": seq}).sort("seq", ASCENDING)
+        return await cursor.to_list(None)
+
+    async def save_game_snapshots(self, snapshots: List[Dict]) -> int:
+        return await self._insert_new(self.db.game_snapshots, snapshots)
+
+    async def get_game_snapshot(self, game_id: str, upto_seq: Optional[int] = None) -> Optional[Dict]:
+        query = {"game_id": ObjectId(game_id)}
+        if upto_seq is not None:
+            query["seq"] = {"$lte": upto_seq}
+        return await self.db.game_snapshots.find_one(query, sort=[("seq", DESCENDING)])
+
+    async def _insert_new(self, collection, docs: List[Dict]) -> int:
+        # Unordered insert that skips documents already there, so a retried batch only adds what is missing
+        if not docs:
+            return 0
+        try:
+            result = await collection.insert_many(docs, ordered=False)
+            return len(result.inserted_ids)
+        except BulkWriteError as error:
+            details = error.details
+            if details.get("writeConcernErrors") or any(e["code"] != 11000 for e in details["writeErrors"]):
+                raise
+            return details["nInserted"]